@@ -0,0 +1,96 @@
+import hashlib
+import math
+from threading import Lock
+
+from adidas.adapters import events, indexes
+
+
+class BloomFilter:
+    # A compact set membership test with no false negatives: might_contain(key) is False only for keys that were
+    # never added. False positives occur at about false_positive_rate while no more than capacity keys are added.
+
+    def __init__(self, capacity, false_positive_rate=0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.number_of_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)))
+        self.number_of_hashes = max(1, int(round(self.number_of_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.number_of_bits + 7) // 8)
+        self._count = 0
+        self._lock = Lock()
+
+    def _positions(self, key):
+        # Double hashing: the i-th position is h1 + i * h2, from one 128-bit digest.
+        digest = hashlib.blake2b(str(key).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.number_of_bits for i in range(self.number_of_hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self._count += 1
+
+    def might_contain(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __contains__(self, key):
+        return self.might_contain(key)
+
+    def __len__(self):
+        return self._count
+
+
+def _all_product_ids(repo):
+    for brand in repo.get_brands():
+        for product in brand.branded_products:
+            yield product.id
+
+
+class ProductFilter:
+    # The repository's product ids in a Bloom filter, sized with headroom for the catalog to double. Products added
+    # later are added to the filter from the repository's PRODUCT_ADDED events, and the filter is rebuilt, sized for
+    # the catalog as it is then, once they exceed its capacity. Lookups read the filter alone, without a lock or a
+    # repository call.
+
+    def __init__(self, repo, false_positive_rate=0.01):
+        self._false_positive_rate = false_positive_rate
+        self._lock = Lock()
+        # Subscribed before the ids are read, and the build holds the lock the handler takes: a product stored
+        # during the build is either in the snapshot or added once the build is done.
+        events.subscribe(repo, events.PRODUCT_ADDED, self._product_added)
+        with self._lock:
+            self._build(repo)
+
+    def _build(self, repo):
+        product_ids = list(_all_product_ids(repo))
+        bloom_filter = BloomFilter(max(2 * len(product_ids), 1024), self._false_positive_rate)
+        for product_id in product_ids:
+            bloom_filter.add(product_id)
+        self._bloom_filter = bloom_filter
+
+    def _product_added(self, repo, product):
+        with self._lock:
+            self._bloom_filter.add(product.id)
+            if len(self._bloom_filter) > self._bloom_filter.capacity:
+                self._build(repo)
+
+    @property
+    def capacity(self):
+        return self._bloom_filter.capacity
+
+    def might_contain(self, product_id):
+        return self._bloom_filter.might_contain(product_id)
+
+
+def get_product_filter(repo):
+    return indexes.get_index(repo, 'product_filter', ProductFilter)
+
+
+def is_known_product(product_id, repo):
+    # False means the product certainly does not exist, without a repository lookup. Until the filter has been
+    # built in the background, every id might exist.
+    product_filter = indexes.get_index_in_background(repo, 'product_filter', ProductFilter)
+    return product_filter is None or product_filter.might_contain(product_id)
@@ -0,0 +1,137 @@
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from adidas.adapters import events
+from adidas.adapters.facet_index import PRICE_BANDS, DISCOUNT_BANDS
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+# The latest analytics built for each repository, which the repository's new comments are counted into.
+_current = WeakKeyDictionary()
+_lock = Lock()
+
+
+class CatalogAnalytics:
+    # A columnar copy of the catalog for merchandising reports: one NumPy array each of brand codes, prices,
+    # discounts and comment counts, in product order. Per-brand aggregates are computed for all brands at once
+    # with bincount and a single sort, rather than by walking every brand's products. Comments added after the
+    # build are counted in with add_comment.
+
+    def __init__(self, products):
+        products = list(products)
+        self.brand_names = sorted({product.brand.brand_name for product in products if product.brand is not None})
+        brand_codes = {brand_name: code for code, brand_name in enumerate(self.brand_names)}
+
+        products = [product for product in products if product.brand is not None]
+        self.brand_codes = np.array([brand_codes[product.brand.brand_name] for product in products], dtype=np.intp)
+        self.prices = np.array([np.nan if product.price is None else product.price for product in products],
+                               dtype=float)
+        self.discounts = np.array([0 if product.discount is None else product.discount for product in products],
+                                  dtype=float)
+        self.comment_counts = np.array([product.number_of_comments for product in products], dtype=np.int64)
+        self._rows = {product.id: row for row, product in enumerate(products)}
+        self._lock = Lock()
+
+    def add_comment(self, comment):
+        # Comments on products added since the build are left to the rebuild that the new product causes.
+        row = self._rows.get(comment.product.id)
+        if row is not None:
+            with self._lock:
+                self.comment_counts[row] += 1
+
+    def brand_summaries(self):
+        # Returns a dict per brand: product and comment counts, price and discount statistics and the number of
+        # products in each price and discount band.
+        number_of_brands = len(self.brand_names)
+        codes = self.brand_codes
+        counts = np.bincount(codes, minlength=number_of_brands)
+        with self._lock:
+            comment_counts = np.bincount(codes, weights=self.comment_counts, minlength=number_of_brands)
+
+        priced = ~np.isnan(self.prices)
+        prices = _grouped_statistics(codes[priced], self.prices[priced], number_of_brands)
+        discounts = _grouped_statistics(codes, self.discounts, number_of_brands)
+        discounted = np.bincount(codes, weights=self.discounts > 0, minlength=number_of_brands)
+        price_bands = _grouped_bands(codes[priced], self.prices[priced], PRICE_BANDS, number_of_brands)
+        discount_bands = _grouped_bands(codes, self.discounts, DISCOUNT_BANDS, number_of_brands)
+
+        summaries = []
+        for code, brand_name in enumerate(self.brand_names):
+            summaries.append({
+                'brand': brand_name,
+                'number_of_products': int(counts[code]),
+                'number_of_comments': int(comment_counts[code]),
+                'comments_per_product': float(comment_counts[code] / counts[code]),
+                'price': prices[code],
+                'price_bands': price_bands[code],
+                'discount': discounts[code],
+                'number_discounted': int(discounted[code]),
+                'discount_bands': discount_bands[code]
+            })
+        return summaries
+
+
+def _grouped_statistics(codes, values, number_of_groups):
+    # Returns min, max, mean and quartiles of values per group (None where a group has no values). Sorting by
+    # (group, value) lays every group out as a sorted run, so each statistic is an index into the runs.
+    counts = np.bincount(codes, minlength=number_of_groups)
+    sums = np.bincount(codes, weights=values, minlength=number_of_groups)
+    sorted_values = values[np.lexsort((values, codes))]
+    starts = np.cumsum(counts) - counts
+
+    present = counts > 0
+    statistics = [None] * number_of_groups
+    if not present.any():
+        return statistics
+
+    # Quartiles interpolate linearly between the two nearest values, as numpy.percentile does.
+    positions = starts[present, None] + (counts[present, None] - 1) * np.asarray(QUANTILES)[None, :]
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.ceil(positions).astype(np.intp)
+    fractions = positions - lower
+    quartiles = sorted_values[lower] * (1 - fractions) + sorted_values[upper] * fractions
+
+    minimums = sorted_values[starts[present]]
+    maximums = sorted_values[starts[present] + counts[present] - 1]
+    means = sums[present] / counts[present]
+    for row, code in enumerate(np.flatnonzero(present)):
+        statistics[code] = {
+            'min': float(minimums[row]),
+            'max': float(maximums[row]),
+            'mean': float(means[row]),
+            'quartiles': [float(quartile) for quartile in quartiles[row]]
+        }
+    return statistics
+
+
+def _grouped_bands(codes, values, bands, number_of_groups):
+    # Returns the number of values per group in each band, as a dict of band label -> count per group.
+    band_indexes = np.searchsorted([lowest for _, lowest in bands], values, side='right') - 1
+    band_indexes = np.maximum(band_indexes, 0)
+    counts = np.bincount(codes * len(bands) + band_indexes, minlength=number_of_groups * len(bands))
+    counts = counts.reshape(number_of_groups, len(bands))
+    return [{label: int(count) for (label, _), count in zip(bands, row)} for row in counts]
+
+
+def build_catalog_analytics(repo):
+    # The repository's comments are followed from its first build; each build replaces the analytics they are
+    # counted into.
+    with _lock:
+        first_build = repo not in _current
+        _current[repo] = None
+    if first_build:
+        events.subscribe(repo, events.COMMENT_ADDED, _count_comment)
+
+    analytics = CatalogAnalytics(product for brand in repo.get_brands() for product in brand.branded_products)
+    with _lock:
+        _current[repo] = analytics
+    return analytics
+
+
+def _count_comment(repo, comment):
+    with _lock:
+        analytics = _current.get(repo)
+    if analytics is not None:
+        analytics.add_comment(comment)
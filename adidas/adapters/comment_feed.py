@@ -0,0 +1,84 @@
+import heapq
+from collections import deque
+from threading import Lock
+
+from adidas.adapters import events
+from adidas.domain.model import Comment
+
+
+class RecentCommentsFeed:
+    # Bounded ring buffers holding the most recent comments across all products, plus one per brand so that a
+    # brand-filtered page costs the same as an unfiltered one.
+
+    def __init__(self, capacity: int = 1000):
+        self._capacity = capacity
+        self._comments = deque(maxlen=capacity)
+        self._comments_by_brand = dict()
+        self._lock = Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def add_comment(self, comment: Comment):
+        brand_name = _brand_name_of(comment)
+        with self._lock:
+            self._comments.append(comment)
+            if brand_name is not None:
+                if brand_name not in self._comments_by_brand:
+                    self._comments_by_brand[brand_name] = deque(maxlen=self._capacity)
+                self._comments_by_brand[brand_name].append(comment)
+
+    def get_comments(self, cursor: int = 0, limit: int = 10, brand_name: str = None):
+        # Returns up to limit comments, newest first, skipping the cursor newest ones.
+        with self._lock:
+            if brand_name is None:
+                comments = self._comments
+            else:
+                comments = self._comments_by_brand.get(brand_name, ())
+            stop = min(len(comments), cursor + limit)
+            return [comments[-1 - position] for position in range(cursor, stop)]
+
+    def __len__(self):
+        return len(self._comments)
+
+
+def _brand_name_of(comment: Comment):
+    brand = comment.product.brand if comment.product is not None else None
+    return brand.brand_name if brand is not None else None
+
+
+def build_recent_comments_feed(repo, capacity: int = 1000):
+    feed = RecentCommentsFeed(capacity)
+    # Comments added later, through any services module, are appended as they are stored. The feed subscribes
+    # before reading the repository's comments, so none stored in between is missed; until the comments read are
+    # loaded, new ones are held back, and those already read are dropped.
+    pending = []
+    lock = Lock()
+
+    def comment_added(repo, comment):
+        with lock:
+            if pending is not None:
+                pending.append(comment)
+                return
+        feed.add_comment(comment)
+
+    events.subscribe(repo, events.COMMENT_ADDED, comment_added)
+    # Only the newest capacity comments can be held, so select them without sorting every comment.
+    newest = heapq.nlargest(capacity, repo.get_comments(), key=lambda comment: comment.timestamp)
+    with lock:
+        for comment in reversed(newest):
+            feed.add_comment(comment)
+        loaded = set(_key_of(comment) for comment in newest)
+        for comment in pending:
+            if _key_of(comment) not in loaded:
+                feed.add_comment(comment)
+        pending = None
+    return feed
+
+
+def _key_of(comment: Comment):
+    # Identifies a comment whether it was read back from the repository or is the object that was stored.
+    username = comment.user.username if comment.user is not None else None
+    product_id = comment.product.id if comment.product is not None else None
+    return username, product_id, comment.timestamp, comment.comment
@@ -0,0 +1,67 @@
+from functools import wraps
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+# Writes to a repository, published to the state derived from it (versions, feeds, rankings, ...). The write
+# methods are wrapped once on the repository instance, so every writer publishes them: the home and products
+# services, the CLI and the tests alike.
+PRODUCT_ADDED = 'product_added'
+PRODUCT_CHANGED = 'product_changed'
+COMMENT_ADDED = 'comment_added'
+
+_WRITE_METHODS = {'add_product': PRODUCT_ADDED, 'add_comment': COMMENT_ADDED}
+# Methods that some repositories have for writing several entities at once.
+_BATCH_WRITE_METHODS = {'add_comments': COMMENT_ADDED}
+
+_subscribers = WeakKeyDictionary()
+_lock = Lock()
+
+
+def subscribe(repo, event, handler):
+    # Calls handler(repo, entity) after each event of the given kind on repo; the entity is the product or comment.
+    # Handlers are held for as long as the repository, so they get it as an argument rather than keeping it.
+    with _lock:
+        handlers = _subscribers.get(repo)
+        if handlers is None:
+            handlers = _subscribers[repo] = dict()
+            _publish_writes(repo)
+        handlers.setdefault(event, []).append(handler)
+
+
+def publish(repo, event, entity):
+    # Called by the wrapped write methods, and by code that changes an entity in place (PRODUCT_CHANGED).
+    with _lock:
+        handlers = list(_subscribers.get(repo, dict()).get(event, ()))
+    for handler in handlers:
+        handler(repo, entity)
+
+
+def _publish_writes(repo):
+    for method_name, event in _WRITE_METHODS.items():
+        setattr(repo, method_name, _publishing(repo, getattr(repo, method_name), event))
+    for method_name, event in _BATCH_WRITE_METHODS.items():
+        if hasattr(repo, method_name):
+            setattr(repo, method_name, _publishing_each(repo, getattr(repo, method_name), event))
+
+
+def _publishing(repo, method, event):
+    @wraps(method)
+    def write(entity):
+        # Published after the write, so subscribers see the entity as stored.
+        result = method(entity)
+        publish(repo, event, entity)
+        return result
+
+    return write
+
+
+def _publishing_each(repo, method, event):
+    @wraps(method)
+    def write(entities):
+        entities = list(entities)
+        result = method(entities)
+        for entity in entities:
+            publish(repo, event, entity)
+        return result
+
+    return write
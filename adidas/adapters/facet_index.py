@@ -0,0 +1,79 @@
+import numpy as np
+
+# Facet values are bands of a product attribute: (label, lowest value in the band).
+PRICE_BANDS = [('0-1999', 0), ('2000-3999', 2000), ('4000-5999', 4000), ('6000-9999', 6000), ('10000+', 10000)]
+DISCOUNT_BANDS = [('0', 0), ('1-20', 1), ('21-40', 21), ('41-60', 41), ('61+', 61)]
+
+
+def _band(value, bands):
+    label = bands[0][0]
+    for band_label, lowest in bands:
+        if value is not None and value >= lowest:
+            label = band_label
+    return label
+
+
+class FacetIndex:
+    # Combinable facets over the catalog. Each facet is a column holding the code of every product's value (-1 for
+    # none), so a selection is a boolean mask per facet, counting is a bincount of the codes under the other facets'
+    # masks, and a page of matches is a slice of the mask's nonzero positions.
+
+    def __init__(self, products):
+        self._product_ids = []
+        values = {'brand': [], 'price_band': [], 'discount': []}
+        for product in products:
+            self._product_ids.append(product.id)
+            values['brand'].append(product.brand.brand_name if product.brand is not None else None)
+            values['price_band'].append(_band(product.price, PRICE_BANDS))
+            values['discount'].append(_band(product.discount, DISCOUNT_BANDS))
+
+        # Per facet: its values in sorted order, the code of each value and the column of codes.
+        self._values = dict()
+        self._value_codes = dict()
+        self._codes = dict()
+        for facet, facet_values in values.items():
+            self._values[facet] = sorted(set(value for value in facet_values if value is not None))
+            self._value_codes[facet] = {value: code for code, value in enumerate(self._values[facet])}
+            self._codes[facet] = np.array([self._value_codes[facet].get(value, -1) for value in facet_values],
+                                          dtype=np.int32)
+
+    @property
+    def facet_names(self):
+        return list(self._codes)
+
+    def _facet_masks(self, selection):
+        # Values selected within a facet are alternatives (OR); facets without a selection are left out.
+        masks = dict()
+        for facet, values in selection.items():
+            if facet not in self._codes or len(values) == 0:
+                continue
+            codes = [self._value_codes[facet][value] for value in values if value in self._value_codes[facet]]
+            masks[facet] = np.isin(self._codes[facet], codes)
+        return masks
+
+    def _matching(self, masks, excluded_facet=None):
+        # Different facets must all match (AND).
+        matching = np.ones(len(self._product_ids), dtype=bool)
+        for facet, mask in masks.items():
+            if facet != excluded_facet:
+                matching &= mask
+        return matching
+
+    def search(self, selection, cursor=0, limit=10):
+        # Returns the ids of the matching products from cursor, the number of matches, and for every facet value
+        # the number of products it would match given the selections in the other facets.
+        masks = self._facet_masks(selection)
+        positions = np.flatnonzero(self._matching(masks))
+        product_ids = [self._product_ids[position] for position in positions[cursor:cursor + limit].tolist()]
+
+        counts = dict()
+        for facet, codes in self._codes.items():
+            matching_codes = codes[self._matching(masks, excluded_facet=facet)]
+            value_counts = np.bincount(matching_codes[matching_codes >= 0], minlength=len(self._values[facet]))
+            counts[facet] = dict(zip(self._values[facet], value_counts.tolist()))
+
+        return product_ids, len(positions), counts
+
+
+def build_facet_index(repo):
+    return FacetIndex(product for brand in repo.get_brands() for product in brand.branded_products)
@@ -0,0 +1,81 @@
+from threading import Lock, Thread
+from weakref import WeakKeyDictionary
+
+from adidas.adapters import events
+
+# Derived indexes are kept per repository instance, so each repository (and each test fixture) gets its own.
+_indexes = WeakKeyDictionary()
+_build_locks = WeakKeyDictionary()
+_background_builds = WeakKeyDictionary()
+_catalog_versions = WeakKeyDictionary()
+_tracked = WeakKeyDictionary()
+_lock = Lock()
+
+
+def get_index(repo, name, build):
+    # Returns the index called name for repo, building it with build(repo) the first time it is requested. Builds
+    # run under a lock of their own, so a slow first build only holds up requests for that index.
+    with _lock:
+        repo_indexes = _indexes.setdefault(repo, dict())
+        if name in repo_indexes:
+            return repo_indexes[name]
+        build_lock = _build_locks.setdefault(repo, dict()).setdefault(name, Lock())
+
+    with build_lock:
+        with _lock:
+            if name in repo_indexes:
+                return repo_indexes[name]
+        index = build(repo)
+        with _lock:
+            repo_indexes[name] = index
+        return index
+
+
+def get_index_in_background(repo, name, build):
+    # Returns the index called name for repo if it has been built. Otherwise starts building it on a thread of its
+    # own, once, and returns None, so that requests for a slow index never wait for its first build.
+    with _lock:
+        index = _indexes.get(repo, dict()).get(name)
+        if index is not None:
+            return index
+        building = _background_builds.setdefault(repo, set())
+        if name in building:
+            return None
+        building.add(name)
+
+    Thread(target=_build_in_background, args=(repo, name, build), name='build-' + name, daemon=True).start()
+    return None
+
+
+def _build_in_background(repo, name, build):
+    # A failed build is left to the next request to retry.
+    try:
+        get_index(repo, name, build)
+    finally:
+        with _lock:
+            _background_builds[repo].discard(name)
+
+
+def bump_catalog_version(repo):
+    # Called by code that changes the catalog in ways the product count does not reveal, e.g. price changes.
+    with _lock:
+        _catalog_versions[repo] = _catalog_versions.get(repo, 0) + 1
+
+
+def catalog_version(repo):
+    # Identifies the current state of the catalog. Adding products changes the product count, so caches keyed on
+    # the version are invalidated by add_product without the repository having to report it.
+    _track_writes(repo)
+    with _lock:
+        version = _catalog_versions.get(repo, 0)
+    return version, repo.get_number_of_products()
+
+
+def _track_writes(repo):
+    # The version follows the repository's product changes from the first time it is read; nothing can have cached
+    # an earlier version.
+    with _lock:
+        if repo in _tracked:
+            return
+        _tracked[repo] = True
+    events.subscribe(repo, events.PRODUCT_CHANGED, lambda repo, product: bump_catalog_version(repo))
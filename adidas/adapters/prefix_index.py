@@ -0,0 +1,67 @@
+import heapq
+from bisect import bisect_left
+
+
+class PrefixIndex:
+    # Autocomplete over product names and brands. Every entry is indexed from the start of each of its words, so
+    # "super" finds "Women's adidas ORIGINALS SUPERSTAR ...". The top-k entries by popularity are precomputed for
+    # every prefix up to max_prefix_length characters (a flattened trie), so a query is a dictionary lookup.
+    # Longer prefixes match few keys and are answered from a sorted array of keys.
+
+    def __init__(self, entries, k=10, max_prefix_length=8):
+        # entries: iterable of (text, kind, popularity), e.g. ("ORIGINALS", "brand", 908).
+        self.k = k
+        self.max_prefix_length = max_prefix_length
+        self._entries = []
+        keys = []
+        for text, kind, popularity in entries:
+            entry = len(self._entries)
+            self._entries.append((text, kind, popularity))
+            words = text.lower().split()
+            for position in range(len(words)):
+                keys.append((' '.join(words[position:]), entry))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._key_entries = [entry for _, entry in keys]
+
+        top = dict()
+        for key, entry in keys:
+            for length in range(1, min(len(key), max_prefix_length) + 1):
+                top.setdefault(key[:length], set()).add(entry)
+        self._top = {prefix: self._rank(entries) for prefix, entries in top.items()}
+
+    def _rank(self, entries):
+        # Most popular first; ties by text so results are stable.
+        best = heapq.nsmallest(self.k, entries, key=lambda entry: (-self._entries[entry][2], self._entries[entry][0]))
+        return tuple(best)
+
+    def suggest(self, prefix, limit=None):
+        limit = self.k if limit is None else min(limit, self.k)
+        prefix = ' '.join(prefix.lower().split())
+        if len(prefix) == 0:
+            return []
+        if len(prefix) <= self.max_prefix_length:
+            entries = self._top.get(prefix, ())
+        else:
+            start = bisect_left(self._keys, prefix)
+            matches = set()
+            for position in range(start, len(self._keys)):
+                if not self._keys[position].startswith(prefix):
+                    break
+                matches.add(self._key_entries[position])
+            entries = self._rank(matches)
+        return [self._entries[entry] for entry in entries[:limit]]
+
+
+def build_prefix_index(repo, k=10):
+    # Product names are ranked by how many products share the name plus the comments on them; brands by how
+    # many products they have.
+    names = dict()
+    entries = []
+    for brand in repo.get_brands():
+        products = list(brand.branded_products)
+        entries.append((brand.brand_name, 'brand', len(products)))
+        for product in products:
+            names[product.name] = names.get(product.name, 0) + 1 + product.number_of_comments
+    entries.extend((name, 'product', popularity) for name, popularity in names.items())
+    return PrefixIndex(entries, k)
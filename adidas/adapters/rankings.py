@@ -0,0 +1,149 @@
+import heapq
+from threading import Lock
+
+from adidas.adapters import events, indexes
+
+
+class _Descending:
+    # Orders product ids in reverse, so that among equal scores the lowest id ranks highest.
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class _TopN:
+    # The capacity highest-ranked entries of a group, with the lowest-ranked of them at the top of a min-heap.
+    # Entries replaced or removed stay in the heap until they reach its top, where they are recognised as stale.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.members = dict()
+        self._heap = []
+
+    def add(self, product_id, key):
+        self.members[product_id] = key
+        heapq.heappush(self._heap, (key, product_id))
+
+    def remove(self, product_id):
+        self.members.pop(product_id, None)
+
+    def lowest(self):
+        # The key of the lowest-ranked member, or None while there are fewer than capacity members.
+        while self._heap and self.members.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if len(self.members) < self.capacity:
+            return None
+        return self._heap[0][0]
+
+    def offer(self, product_id, key):
+        # Adds the product if it ranks among the capacity highest.
+        lowest = self.lowest()
+        if lowest is None:
+            self.add(product_id, key)
+        elif lowest < key:
+            self.remove(heapq.heappop(self._heap)[1])
+            self.add(product_id, key)
+
+
+class Ranking:
+    # The highest-scoring products, overall and per brand. Only the capacity highest of each are kept in order;
+    # a re-scored product is offered to its groups in O(log capacity), and a group is only refilled from the scores
+    # of all its products when one of its members drops out of the top.
+
+    def __init__(self, score, capacity=50):
+        self._score = score
+        self._capacity = capacity
+        # Every product's key and brand, and the ids of each brand's products.
+        self._keys = dict()
+        self._brand_names = dict()
+        self._brand_products = dict()
+        self._top = {None: _TopN(capacity)}
+        self._lock = Lock()
+
+    def update(self, product):
+        brand_name = product.brand.brand_name if product.brand is not None else None
+        key = (self._score(product), _Descending(product.id))
+        with self._lock:
+            old_brand_name = self._brand_names.get(product.id)
+            if product.id in self._keys and old_brand_name != brand_name and old_brand_name is not None:
+                self._brand_products[old_brand_name].discard(product.id)
+                self._rerank(old_brand_name, product.id)
+            self._keys[product.id] = key
+            self._brand_names[product.id] = brand_name
+            self._rerank(None, product.id)
+            if brand_name is not None:
+                self._brand_products.setdefault(brand_name, set()).add(product.id)
+                self._rerank(brand_name, product.id)
+
+    def _rerank(self, brand_name, product_id):
+        top = self._top.setdefault(brand_name, _TopN(self._capacity))
+        in_group = brand_name is None or product_id in self._brand_products.get(brand_name, ())
+        if product_id not in top.members:
+            if in_group:
+                top.offer(product_id, self._keys[product_id])
+            return
+
+        if in_group:
+            lowest = top.lowest()
+            key = self._keys[product_id]
+            if lowest is None or not key < lowest:
+                top.add(product_id, key)
+                return
+        # The member dropped out of the group's top (or the group), so the group is refilled from scratch.
+        product_ids = self._keys if brand_name is None else self._brand_products.get(brand_name, ())
+        refilled = _TopN(self._capacity)
+        for other_id in product_ids:
+            refilled.offer(other_id, self._keys[other_id])
+        self._top[brand_name] = refilled
+
+    def top(self, limit, brand_name=None):
+        # Returns the ids of the limit highest-scoring products, optionally only those of one brand.
+        with self._lock:
+            if limit is None or limit > self._capacity:
+                product_ids = self._keys if brand_name is None else self._brand_products.get(brand_name, ())
+                keys = [(self._keys[product_id], product_id) for product_id in product_ids]
+            else:
+                top = self._top.get(brand_name)
+                keys = [] if top is None else [(key, product_id) for product_id, key in top.members.items()]
+        return [product_id for _, product_id in heapq.nlargest(len(keys) if limit is None else limit, keys)]
+
+
+def _discount(product):
+    return product.discount if product.discount is not None else 0
+
+
+def _number_of_comments(product):
+    return product.number_of_comments
+
+
+class Rankings:
+    def __init__(self, products=()):
+        self.best_deals = Ranking(_discount)
+        self.most_reviewed = Ranking(_number_of_comments)
+        for product in products:
+            self.update(product)
+
+    def update(self, product):
+        self.best_deals.update(product)
+        self.most_reviewed.update(product)
+
+
+def build_rankings(repo):
+    # Ranks the repository's products and follows its writes: added and changed products are re-ranked, and a new
+    # comment re-ranks its product among the most reviewed.
+    rankings = Rankings(product for brand in repo.get_brands() for product in brand.branded_products)
+    events.subscribe(repo, events.PRODUCT_ADDED, lambda repo, product: rankings.update(product))
+    events.subscribe(repo, events.PRODUCT_CHANGED, lambda repo, product: rankings.update(product))
+    events.subscribe(repo, events.COMMENT_ADDED, lambda repo, comment: rankings.most_reviewed.update(comment.product))
+    return rankings
+
+
+def get_rankings(repo):
+    return indexes.get_index(repo, 'rankings', build_rankings)
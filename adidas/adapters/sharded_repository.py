@@ -0,0 +1,232 @@
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import List
+from zlib import crc32
+
+from adidas.adapters.repository import AbstractRepository, RepositoryException
+from adidas.domain.model import User, Product, Brand, Comment, make_brand_association
+
+
+def shard_index(product_id, number_of_shards):
+    # crc32 rather than hash() so that products map to the same shard in every process.
+    return crc32(str(product_id).encode('utf-8')) % number_of_shards
+
+
+class ShardedRepository(AbstractRepository):
+    # Partitions products, and the comments on them, across several repositories (typically one SqlAlchemyRepository
+    # per SQLite file) by hashing the product id. Users and brands are replicated to every shard; a comment is
+    # made with its product's shard's copy of its user (see get_user_for_product), and brands are read as one brand
+    # over all their copies. Reads that span shards and return counts or ids are fanned out in parallel and merged;
+    # those returning domain objects query the shards in turn from the calling thread, so the objects belong to its
+    # sessions. Previous/next prices come from a price index kept here. close() stops the fan-out threads.
+
+    def __init__(self, shards: List[AbstractRepository]):
+        self._shards = list(shards)
+        self._executor = ThreadPoolExecutor(max_workers=len(self._shards), thread_name_prefix='shard')
+        self._prices = sorted(product.price for product in self._all_products())
+        self._prices_lock = Lock()
+
+    @property
+    def shards(self):
+        return list(self._shards)
+
+    def shard_for(self, product_id):
+        return self._shards[shard_index(product_id, len(self._shards))]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _fan_out(self, call):
+        # A worker thread's database session is closed after each call, so that it neither holds a connection nor
+        # keeps reading an old snapshot; hence only plain values may be returned.
+        def call_and_close(shard):
+            try:
+                return call(shard)
+            finally:
+                close_session = getattr(shard, 'close_session', None)
+                if close_session is not None:
+                    close_session()
+
+        return list(self._executor.map(call_and_close, self._shards))
+
+    def _each_shard(self, call):
+        return [call(shard) for shard in self._shards]
+
+    def _all_products(self):
+        for shard in self._shards:
+            for brand in shard.get_brands():
+                yield from brand.branded_products
+
+    def add_user(self, user: User):
+        self._shards[0].add_user(user)
+        for shard in self._shards[1:]:
+            shard.add_user(User(user.username, user.password))
+
+    def get_user(self, username) -> User:
+        # Every shard has its own copy; comments must be made with get_user_for_product's.
+        return self._shards[0].get_user(username)
+
+    def get_user_for_product(self, username, product_id) -> User:
+        return self.shard_for(product_id).get_user(username)
+
+    def add_product(self, product: Product):
+        self.shard_for(product.id).add_product(product)
+        with self._prices_lock:
+            insort(self._prices, product.price)
+
+    def get_product(self, product_id) -> Product:
+        return self.shard_for(product_id).get_product(product_id)
+
+    def get_number_of_products(self):
+        return sum(self._fan_out(lambda shard: shard.get_number_of_products()))
+
+    def get_products_by_price(self, target_price) -> List[Product]:
+        return sorted(product for products in self._each_shard(lambda shard: shard.get_products_by_price(target_price))
+                      for product in products)
+
+    def get_first_product(self) -> Product:
+        products = [product for product in self._each_shard(lambda shard: shard.get_first_product()) if product]
+        return min(products) if len(products) > 0 else None
+
+    def get_last_product(self) -> Product:
+        products = [product for product in self._each_shard(lambda shard: shard.get_last_product()) if product]
+        return max(products) if len(products) > 0 else None
+
+    def get_products_by_id(self, id_list):
+        # Fetches each shard's ids in one call, then restores the requested order, leaving out unknown ids.
+        ids_by_shard = dict()
+        for product_id in id_list:
+            ids_by_shard.setdefault(shard_index(product_id, len(self._shards)), []).append(product_id)
+
+        found = dict()
+        for index, product_ids in ids_by_shard.items():
+            # Keyed by the products' own ids: repositories may leave out unknown ids rather than return None.
+            found.update((product.id, product) for product in self._shards[index].get_products_by_id(product_ids)
+                         if product is not None)
+        return [found[product_id] for product_id in id_list if product_id in found]
+
+    def get_product_ids_for_brand(self, brand_name: str):
+        return [product_id for product_ids in self._fan_out(lambda shard: shard.get_product_ids_for_brand(brand_name))
+                for product_id in product_ids]
+
+    def get_price_of_previous_product(self, product: Product):
+        with self._prices_lock:
+            position = bisect_left(self._prices, product.price)
+            return self._prices[position - 1] if position > 0 else None
+
+    def get_price_of_next_product(self, product: Product):
+        with self._prices_lock:
+            position = bisect_right(self._prices, product.price)
+            return self._prices[position] if position < len(self._prices) else None
+
+    def add_brand(self, brand: Brand):
+        self._shards[0].add_brand(brand)
+        for shard in self._shards[1:]:
+            shard.add_brand(Brand(brand.brand_name))
+
+    def get_brands(self) -> List[Brand]:
+        # Each shard's copy of a brand holds that shard's products, so every brand is returned as the merge of its
+        # copies, in the order of the first shard.
+        copies = dict()
+        for brands in self._each_shard(lambda shard: shard.get_brands()):
+            for brand in brands:
+                copies.setdefault(brand.brand_name, []).append(brand)
+        return [MergedBrand(brand_copies) for brand_copies in copies.values()]
+
+    def add_comment(self, comment: Comment):
+        shard = self.shard_for(comment.product.id)
+        if comment.user is not None and shard.get_user(comment.user.username) is not comment.user:
+            # Another shard's copy of the user (e.g. the one get_user returns) cannot be referenced from here.
+            raise RepositoryException('Comment on {} was not made with the user from get_user_for_product'
+                                      .format(comment.product.id))
+        shard.add_comment(comment)
+
+    def get_comments(self):
+        return [comment for comments in self._each_shard(lambda shard: shard.get_comments()) for comment in comments]
+
+
+class MergedBrand:
+    # A brand as seen across shards: its copies, each holding the products of its own shard.
+
+    def __init__(self, copies: List[Brand]):
+        self._copies = list(copies)
+
+    @property
+    def brand_name(self) -> str:
+        return self._copies[0].brand_name
+
+    @property
+    def branded_products(self):
+        for brand in self._copies:
+            yield from brand.branded_products
+
+    @property
+    def number_of_branded_products(self) -> int:
+        return sum(brand.number_of_branded_products for brand in self._copies)
+
+    def is_applied_to(self, product: Product) -> bool:
+        return any(brand.is_applied_to(product) for brand in self._copies)
+
+    def __repr__(self) -> str:
+        return '<Brand {}>'.format(self.brand_name)
+
+    def __eq__(self, other):
+        return getattr(other, 'brand_name', None) == self.brand_name
+
+    def __lt__(self, other):
+        return self.brand_name < other.brand_name
+
+    def __hash__(self):
+        return hash(self.brand_name)
+
+
+def copy_catalog(source: AbstractRepository, target: AbstractRepository, usernames=()):
+    # Copies brands, products, comments and users from source into target using fresh domain objects, so source
+    # and target may be different kinds of repository. Users are found through their comments, plus usernames.
+    # When target is sharded, each product is branded and commented with its own shard's brand and user objects.
+    if isinstance(target, ShardedRepository):
+        repositories = target.shards
+        repository_for = target.shard_for
+    else:
+        repositories = [target]
+        repository_for = lambda product_id: target
+
+    users = set()
+    for username in usernames:
+        user = source.get_user(username)
+        if user is not None and user.username not in users:
+            users.add(user.username)
+            target.add_user(User(user.username, user.password))
+
+    for brand in source.get_brands():
+        target.add_brand(Brand(brand.brand_name))
+    brands = [{brand.brand_name: brand for brand in repository.get_brands()} for repository in repositories]
+
+    for brand in source.get_brands():
+        for product in brand.branded_products:
+            target_product = Product(product.name, product.description, product.hyperlink, product.image_hyperlink,
+                                     product.id, product.price, product.discount)
+            repository = repository_for(product.id)
+            make_brand_association(target_product, brands[repositories.index(repository)][brand.brand_name])
+            target.add_product(target_product)
+
+    for comment in sorted(source.get_comments(), key=lambda comment: comment.timestamp):
+        if comment.user.username not in users:
+            users.add(comment.user.username)
+            target.add_user(User(comment.user.username, comment.user.password))
+        repository = repository_for(comment.product.id)
+        user = repository.get_user(comment.user.username)
+        product = repository.get_product(comment.product.id)
+        target_comment = Comment(user, product, comment.comment, comment.timestamp)
+        user.add_comment(target_comment)
+        product.add_comment(target_comment)
+        target.add_comment(target_comment)
+
+
+def rebalance(source: AbstractRepository, new_shards: List[AbstractRepository], usernames=()):
+    # Builds a ShardedRepository over new_shards (e.g. when changing the number of shards) holding the source's
+    # catalog; products move to the shard their id hashes to under the new shard count.
+    target = ShardedRepository(new_shards)
+    copy_catalog(source, target, usernames)
+    return target
@@ -0,0 +1,253 @@
+import math
+import re
+from bisect import bisect_right
+from collections import Counter
+from threading import Lock
+
+import numpy as np
+from scipy import sparse
+
+from adidas.adapters import events, indexes
+from adidas.adapters.facet_index import PRICE_BANDS
+
+_WORD = re.compile(r'[a-z0-9]+')
+_PRICE_BAND_LOWEST = [lowest for _, lowest in PRICE_BANDS]
+
+# Weights of the feature groups in a product's vector. Text dominates; products of the same brand or price band
+# are pulled closer together.
+TEXT_WEIGHT = 1.0
+BRAND_WEIGHT = 0.5
+PRICE_WEIGHT = 0.3
+
+
+def tokenize(text):
+    return _WORD.findall(text.lower()) if text else []
+
+
+class SimilarProducts:
+    # The k most similar products of every product, precomputed. Products are vectors of TF-IDF weights over the
+    # words of their name and description, plus one-hot brand and price band columns; similarity is the cosine of
+    # two vectors. Neighbours are found for a batch of products at a time with one sparse matrix product, keeping
+    # the k highest scores of each row, so lookups are a dictionary access.
+    #
+    # Added or changed products are vectorised against the vocabulary and IDF weights of the initial build (words
+    # first seen later are ignored). Their vectors are buffered and appended to the matrix together when the index
+    # is next read, and only the neighbour lists they can affect are recomputed, found from a reverse index of the
+    # lists every product is in. A change that leaves a product's vector as it was (e.g. a price change within its
+    # band) costs nothing more. Otherwise the product gets a new row and its old row is emptied; emptied rows are
+    # dropped from the matrix once they make up a quarter of it.
+
+    def __init__(self, products, k=10, batch_size=128, max_dead_fraction=0.25):
+        products = list(products)
+        self.k = k
+        self.batch_size = batch_size
+        self.max_dead_fraction = max_dead_fraction
+        self._lock = Lock()
+
+        documents = [tokenize(product.name) + tokenize(product.description) for product in products]
+        document_frequency = Counter(term for document in documents for term in set(document))
+        self._vocabulary = {term: column for column, term in enumerate(sorted(document_frequency))}
+        self._idf = [math.log((1 + len(documents)) / (1 + document_frequency[term])) + 1
+                     for term in sorted(document_frequency)]
+        # Columns after the words: price bands, then brands in order of appearance.
+        self._brand_columns = dict()
+
+        self._product_ids = []
+        self._rows = dict()
+        self._matrix = sparse.csr_matrix((0, self._number_of_columns()))
+        self._neighbours = dict()
+        # For every row, the rows whose neighbour lists include it.
+        self._listed_in = dict()
+        # Vectors of rows not yet in the matrix, rows whose neighbour lists must be recomputed, and the number of
+        # emptied rows.
+        self._pending = []
+        self._stale = set()
+        self._dead = 0
+        for product, document in zip(products, documents):
+            self._buffer(product, document)
+        self._flush()
+
+    def _number_of_columns(self):
+        return len(self._vocabulary) + len(PRICE_BANDS) + len(self._brand_columns)
+
+    def _vector(self, product, document=None):
+        # Returns the product's unit-length vector as a dict of column -> weight.
+        if document is None:
+            document = tokenize(product.name) + tokenize(product.description)
+        vector = dict()
+
+        term_counts = Counter(term for term in document if term in self._vocabulary)
+        if term_counts:
+            weights = {self._vocabulary[term]: count * self._idf[self._vocabulary[term]]
+                       for term, count in term_counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            vector.update((column, TEXT_WEIGHT * weight / norm) for column, weight in weights.items())
+
+        if product.price is not None:
+            band = max(bisect_right(_PRICE_BAND_LOWEST, product.price) - 1, 0)
+            vector[len(self._vocabulary) + band] = PRICE_WEIGHT
+
+        if product.brand is not None:
+            brand_name = product.brand.brand_name
+            if brand_name not in self._brand_columns:
+                self._brand_columns[brand_name] = self._number_of_columns()
+            vector[self._brand_columns[brand_name]] = BRAND_WEIGHT
+
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {column: weight / norm for column, weight in vector.items()} if norm else vector
+
+    def _to_matrix(self, vectors):
+        columns = [column for vector in vectors for column in vector]
+        weights = [weight for vector in vectors for weight in vector.values()]
+        pointers = np.cumsum([0] + [len(vector) for vector in vectors])
+        return sparse.csr_matrix((weights, columns, pointers), shape=(len(vectors), self._number_of_columns()))
+
+    def _buffer(self, product, document=None):
+        # Gives the product a new row, whose vector is appended to the matrix by the next flush.
+        self._rows[product.id] = len(self._product_ids)
+        self._product_ids.append(product.id)
+        self._pending.append(self._vector(product, document))
+
+    def _flush(self):
+        # Appends the buffered vectors to the matrix in one go, then computes the neighbour lists of the new rows
+        # and of the stale ones, and offers the new rows to the lists of the others.
+        if len(self._pending) == 0 and len(self._stale) == 0:
+            return
+        new_rows = list(range(self._matrix.shape[0], len(self._product_ids)))
+        if self._pending:
+            self._matrix.resize((self._matrix.shape[0], self._number_of_columns()))
+            self._matrix = sparse.vstack([self._matrix, self._to_matrix(self._pending)], format='csr')
+            self._pending = []
+        recomputed = set(new_rows) | self._stale
+        self._compute_neighbours(new_rows + sorted(self._stale - set(new_rows)), set(new_rows), recomputed)
+        self._stale = set()
+        if self._dead > self.max_dead_fraction * self._matrix.shape[0]:
+            self._compact()
+
+    def _compact(self):
+        # Drops the emptied rows from the matrix and renumbers the others. No neighbour list refers to an emptied
+        # row once the stale lists have been recomputed.
+        live = sorted(self._rows.values())
+        renumbered = {row: new_row for new_row, row in enumerate(live)}
+        self._matrix = self._matrix[live]
+        self._product_ids = [self._product_ids[row] for row in live]
+        self._rows = {product_id: renumbered[row] for product_id, row in self._rows.items()}
+        self._neighbours = {renumbered[row]: [(score, renumbered[neighbour]) for score, neighbour in neighbours]
+                            for row, neighbours in self._neighbours.items()}
+        self._listed_in = {renumbered[row]: set(renumbered[other] for other in others)
+                           for row, others in self._listed_in.items()}
+        self._dead = 0
+
+    def _set_neighbours(self, row, neighbours):
+        for _, neighbour in self._neighbours.get(row, ()):
+            if neighbour in self._listed_in:
+                self._listed_in[neighbour].discard(row)
+        self._neighbours[row] = neighbours
+        for _, neighbour in neighbours:
+            self._listed_in.setdefault(neighbour, set()).add(row)
+
+    def _compute_neighbours(self, rows, offered, recomputed):
+        # Scores rows against every product, batch by batch, without materialising the batch's dense score matrix.
+        # Rows in offered are also inserted into the neighbour lists of products not in recomputed.
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            scores = (self._matrix[batch] @ self._matrix.T).tocsr()
+            for position, row in enumerate(batch):
+                begin, end = scores.indptr[position], scores.indptr[position + 1]
+                columns, values = scores.indices[begin:end], scores.data[begin:end]
+                matching = (values > 0) & (columns != row)
+                columns, values = columns[matching], values[matching]
+                if row in offered:
+                    self._offer(row, columns, values, recomputed)
+                if len(values) > self.k:
+                    top = np.argpartition(-values, self.k - 1)[:self.k]
+                    columns, values = columns[top], values[top]
+                order = np.argsort(-values, kind='stable')
+                self._set_neighbours(row, list(zip(values[order].tolist(), columns[order].tolist())))
+
+    def _offer(self, candidate, rows, scores, recomputed):
+        # Inserts candidate into the neighbour lists of rows where its score makes the top k.
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            if row in recomputed:
+                continue
+            neighbours = self._neighbours[row]
+            if len(neighbours) < self.k or score > neighbours[-1][0]:
+                neighbours = sorted(neighbours + [(score, candidate)], key=lambda neighbour: -neighbour[0])
+                self._set_neighbours(row, neighbours[:self.k])
+
+    def add_product(self, product):
+        with self._lock:
+            if product.id in self._rows:
+                self._update(product)
+            else:
+                self._buffer(product)
+
+    def update_product(self, product):
+        # Re-vectorises a product whose name, description, brand or price has changed.
+        with self._lock:
+            self._update(product)
+
+    def _update(self, product):
+        row = self._rows.get(product.id)
+        if row is None:
+            self._buffer(product)
+            return
+        vector = self._vector(product)
+        if row >= self._matrix.shape[0]:
+            # Not in the matrix yet, so the buffered vector is simply replaced.
+            self._pending[row - self._matrix.shape[0]] = vector
+            return
+
+        begin, end = self._matrix.indptr[row], self._matrix.indptr[row + 1]
+        if vector == dict(zip(self._matrix.indices[begin:end].tolist(), self._matrix.data[begin:end].tolist())):
+            return
+        # The old row is emptied in place, so it no longer scores against anything. Lists that held the product
+        # may now rank it too high; they are recomputed along with the product's new row.
+        self._matrix.data[begin:end] = 0
+        self._dead += 1
+        self._set_neighbours(row, [])
+        self._stale.update(self._listed_in.pop(row, ()))
+        self._stale.discard(row)
+        del self._neighbours[row]
+        self._buffer(product)
+
+    def similar(self, product_id, limit=None):
+        # Returns the ids of the products most similar to product_id, most similar first.
+        with self._lock:
+            self._flush()
+            row = self._rows.get(product_id)
+            if row is None:
+                return []
+            return [self._product_ids[neighbour] for _, neighbour in self._neighbours[row][:limit]]
+
+    def recommend(self, product_ids, limit=10):
+        # Returns the ids of the products most similar to the given ones taken together (summing the scores of
+        # their neighbour lists), excluding the given products.
+        with self._lock:
+            self._flush()
+            rows = [self._rows[product_id] for product_id in product_ids if product_id in self._rows]
+            totals = Counter()
+            for row in rows:
+                for score, neighbour in self._neighbours[row]:
+                    totals[neighbour] += score
+            for row in rows:
+                totals.pop(row, None)
+            return [self._product_ids[row] for row, _ in totals.most_common(limit)]
+
+
+def build_similar_products(repo):
+    # Precomputes the repository's similar products and follows its writes, so that products added or changed
+    # later are included too.
+    similar_products = SimilarProducts(product for brand in repo.get_brands() for product in brand.branded_products)
+    events.subscribe(repo, events.PRODUCT_ADDED, lambda repo, product: similar_products.add_product(product))
+    events.subscribe(repo, events.PRODUCT_CHANGED, lambda repo, product: similar_products.update_product(product))
+    return similar_products
+
+
+def get_similarity_index(repo):
+    return indexes.get_index(repo, 'similar_products', build_similar_products)
+
+
+def get_built_similarity_index(repo):
+    # Returns the index if it has been built; otherwise starts building it in the background and returns None.
+    return indexes.get_index_in_background(repo, 'similar_products', build_similar_products)
@@ -0,0 +1,51 @@
+# Sort keys offered for listings: name -> (attribute, descending).
+SORT_KEYS = {
+    'price': ('price', False),
+    'price_desc': ('price', True),
+    'discount': ('discount', True)
+}
+
+
+class SortOrders:
+    # Precomputed orderings of the catalog, one per sort key. Each ordering is kept both as a permutation (product
+    # ids in sorted order) and as a rank per product id, so a result set can be sorted either by walking the
+    # permutation and keeping members (large result sets) or by sorting on the ranks (small ones).
+
+    def __init__(self, products):
+        products = list(products)
+        self._orders = dict()
+        self._ranks = dict()
+        for sort_key, (attribute, descending) in SORT_KEYS.items():
+            def key(product):
+                value = getattr(product, attribute)
+                value = 0 if value is None else value
+                return (-value if descending else value), product.id
+            order = [product.id for product in sorted(products, key=key)]
+            self._orders[sort_key] = order
+            self._ranks[sort_key] = {product_id: rank for rank, product_id in enumerate(order)}
+
+    def sort(self, product_ids, sort_key, cursor=0, limit=None):
+        # Returns the page of product_ids (from cursor, at most limit long) in sort_key order. Ids unknown to the
+        # orderings, e.g. products added since they were built, come last in their original order.
+        order = self._orders[sort_key]
+        ranks = self._ranks[sort_key]
+        stop = None if limit is None else cursor + limit
+
+        if stop is not None and len(product_ids) * 4 > len(order):
+            # A large share of the catalog: walk the presorted permutation until the page is full.
+            members = set(product_ids)
+            page = []
+            for product_id in order:
+                if product_id in members:
+                    page.append(product_id)
+                    if len(page) == stop:
+                        return page[cursor:]
+            unknown = [product_id for product_id in product_ids if product_id not in ranks]
+            return (page + unknown)[cursor:stop]
+
+        ranked = sorted(product_ids, key=lambda product_id: ranks.get(product_id, len(order)))
+        return ranked[cursor:stop]
+
+
+def build_sort_orders(repo):
+    return SortOrders(product for brand in repo.get_brands() for product in brand.branded_products)
@@ -0,0 +1,113 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.expression import Insert, Update, Delete
+
+import adidas.adapters.repository as repo
+from adidas.adapters.database_repository import SqlAlchemyRepository
+
+# Applied to every connection. WAL lets readers proceed while a comment is being written; synchronous=NORMAL is
+# durable across application crashes in WAL mode and only fsyncs at checkpoints.
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY'
+}
+
+
+def configure_pragmas(engine, read_only=False, pragmas=PRAGMAS):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        if read_only:
+            cursor.execute('PRAGMA query_only = ON')
+        cursor.close()
+
+
+def create_write_engine(database_uri, echo=False):
+    # An engine with a single pooled connection for writing, as SQLite allows one writer at a time.
+    write_engine = create_engine(database_uri, poolclass=QueuePool, pool_size=1, max_overflow=0,
+                                 connect_args={'check_same_thread': False}, echo=echo)
+    configure_pragmas(write_engine)
+    return write_engine
+
+
+def create_engines(database_uri, read_pool_size=4, echo=False):
+    # Returns (write_engine, read_engine). Writes go through a single pooled connection; reads use a separate pool
+    # of read-only connections.
+    write_engine = create_write_engine(database_uri, echo)
+    read_engine = create_engine(database_uri, poolclass=QueuePool, pool_size=read_pool_size, max_overflow=0,
+                                connect_args={'check_same_thread': False}, echo=echo)
+    configure_pragmas(read_engine, read_only=True)
+    return write_engine, read_engine
+
+
+class RoutingSession(Session):
+    # Sends flushes and data-changing statements to the writer connection and everything else to the read pool.
+    # Once the session has pending changes or has written, it stays on the writer until the transaction ends, so
+    # it reads its own writes before they are committed.
+
+    def __init__(self, write_engine, read_engine, **kwargs):
+        super().__init__(**kwargs)
+        self._write_engine = write_engine
+        self._read_engine = read_engine
+        self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._writing and (self._flushing or _is_write(clause) or not self._is_clean()):
+            self._writing = True
+        return self._write_engine if self._writing else self._read_engine
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._writing = False
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._writing = False
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._writing = False
+
+
+def _is_write(clause):
+    if isinstance(clause, (Insert, Update, Delete)):
+        return True
+    return isinstance(clause, TextClause) and not _is_query(clause.text)
+
+
+def _is_query(sql):
+    words = sql.split(None, 1)
+    return len(words) > 0 and words[0].upper() in ('SELECT', 'WITH')
+
+
+def make_session_factory(database_uri, read_pool_size=4, echo=False):
+    # A drop-in replacement for sessionmaker(bind=engine) when constructing SqlAlchemyRepository on SQLite.
+    write_engine, read_engine = create_engines(database_uri, read_pool_size, echo)
+    return sessionmaker(class_=RoutingSession, write_engine=write_engine, read_engine=read_engine,
+                        autocommit=False, autoflush=True)
+
+
+def init_app(app):
+    # A file-backed SQLite database repository is served through a writer connection and a pool of
+    # SQLITE_READ_POOL_SIZE read-only connections. Must run before anything keys state on the repository instance.
+    database_uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if app.config.get('REPOSITORY') != 'database' or not database_uri.startswith('sqlite:///'):
+        return
+
+    session_factory = make_session_factory(database_uri, app.config.get('SQLITE_READ_POOL_SIZE', 4),
+                                           app.config.get('SQLALCHEMY_ECHO', False))
+    repo.repo_instance = SqlAlchemyRepository(session_factory)
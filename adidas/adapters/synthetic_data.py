@@ -0,0 +1,120 @@
+"""Generates synthetic adidas.csv, users.csv and comments.csv files of arbitrary size.
+
+The generated catalog is statistically similar to a sample feed (by default tests/data/memory): every product
+takes its brand, listing price, discount, rating and review count jointly from a randomly chosen sample product,
+so the brand mix and the price and discount distributions (and their correlations) are preserved. Descriptions
+have the sample's length distribution and are drawn from its vocabulary. Output is written row by row, so memory
+use does not grow with the number of rows, and the same seed always produces the same files.
+
+    python -m adidas.adapters.synthetic_data OUTPUT_DIR --products 1000000 --users 10000 --comments 500000
+"""
+import argparse
+import csv
+import os
+import random
+import string
+from datetime import datetime, timedelta
+
+PRODUCT_HEADER = ['URL', 'Product Name', 'Product ID', 'Listing Price', 'Sale Price', 'Discount', 'Brand',
+                  'Description', 'Rating', 'Reviews', 'Images', 'Last Visited']
+
+DEFAULT_SAMPLE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'tests', 'data', 'memory')
+
+FIRST_VISIT = datetime(2020, 4, 13, 15, 0, 0)
+FIRST_COMMENT = datetime(2020, 2, 28, 0, 0, 0)
+
+
+class CatalogProfile:
+    # The parts of a sample feed that generated products are drawn from.
+
+    def __init__(self, sample_path=DEFAULT_SAMPLE_PATH):
+        self.products = []
+        self.description_lengths = []
+        self.vocabulary = []
+        vocabulary = set()
+
+        with open(os.path.join(sample_path, 'adidas.csv'), newline='', encoding='utf-8-sig') as sample:
+            for row in csv.DictReader(sample):
+                self.products.append((row['Brand'], int(row['Listing Price']), int(row['Discount']),
+                                      row['Rating'], row['Reviews'], row['Product Name']))
+                words = row['Description'].split()
+                self.description_lengths.append(len(words))
+                vocabulary.update(words)
+
+        # Sorted so that the vocabulary, and hence the output, does not depend on set ordering.
+        self.vocabulary = sorted(vocabulary)
+
+
+def product_id(index):
+    # Product ids are derived from the row index, so comments can refer to products without remembering them.
+    return 'SYN{:08d}'.format(index)
+
+
+def generate_products(file, count, profile, rng):
+    writer = csv.writer(file, quoting=csv.QUOTE_NONNUMERIC)
+    writer.writerow(PRODUCT_HEADER)
+    for index in range(count):
+        brand, listing_price, discount, rating, reviews, name = rng.choice(profile.products)
+        identifier = product_id(index)
+        sale_price = listing_price * (100 - discount) // 100
+        description = ' '.join(rng.choices(profile.vocabulary, k=rng.choice(profile.description_lengths)))
+        images = '[{}]'.format(','.join(
+            '"https://content.adidas.co.in/static/Product-{0}/{0}_{1}.jpg"'.format(identifier, image)
+            for image in range(1, 7)
+        ))
+        last_visited = (FIRST_VISIT + timedelta(seconds=index)).isoformat()
+        writer.writerow(['https://shop.adidas.co.in/#!product/' + identifier, name, identifier, listing_price,
+                         sale_price, discount, brand, description, rating, reviews, images, last_visited])
+
+
+def generate_users(file, count, rng):
+    writer = csv.writer(file)
+    writer.writerow(['id', 'username', 'password'])
+    for index in range(1, count + 1):
+        # Passwords satisfy the registration rules: upper and lower case letters, a digit and at least 8 long.
+        password = (rng.choice(string.ascii_uppercase) + rng.choice(string.ascii_lowercase) + rng.choice(string.digits)
+                    + ''.join(rng.choices(string.ascii_letters + string.digits, k=9)))
+        writer.writerow([index, 'user{}'.format(index), password])
+
+
+def generate_comments(file, count, number_of_users, number_of_products, profile, rng):
+    writer = csv.writer(file)
+    writer.writerow(['id', 'author-id', 'product-id', 'comment-text', 'timestamp'])
+    timestamp = FIRST_COMMENT
+    for index in range(1, count + 1):
+        # Comments arrive in timestamp order, a few seconds to a few minutes apart.
+        timestamp += timedelta(seconds=rng.randint(1, 300))
+        text = ' '.join(rng.choices(profile.vocabulary, k=rng.randint(3, 25)))
+        writer.writerow([index, rng.randint(1, number_of_users), product_id(rng.randrange(number_of_products)),
+                         text, timestamp.strftime('%Y-%m-%d %H:%M:%S')])
+
+
+def generate(output_path, products, users, comments, seed=0, sample_path=DEFAULT_SAMPLE_PATH):
+    profile = CatalogProfile(sample_path)
+    rng = random.Random(seed)
+    os.makedirs(output_path, exist_ok=True)
+
+    with open(os.path.join(output_path, 'adidas.csv'), 'w', newline='', encoding='utf-8') as file:
+        generate_products(file, products, profile, rng)
+    with open(os.path.join(output_path, 'users.csv'), 'w', newline='', encoding='utf-8') as file:
+        generate_users(file, users, rng)
+    with open(os.path.join(output_path, 'comments.csv'), 'w', newline='', encoding='utf-8') as file:
+        generate_comments(file, comments, users, products, profile, rng)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_path')
+    parser.add_argument('--products', type=int, default=2625)
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--comments', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--sample-path', default=DEFAULT_SAMPLE_PATH)
+    args = parser.parse_args(argv)
+
+    generate(args.output_path, args.products, args.users, args.comments, args.seed, args.sample_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import wraps
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import object_session, sessionmaker
+
+from adidas.adapters import sqlite_engines
+from adidas.adapters.repository import AbstractRepository
+
+
+class GroupCommitWriter:
+    # A write-behind queue for the database adapter. Mutations submitted by many requests are collected for up to
+    # flush_interval seconds (or max_batch mutations) and applied by a single writer thread in one transaction,
+    # so SQLite pays for one commit and one fsync per group rather than per comment. Each submitter gets a Future
+    # that completes once its mutation is committed; waiting on it gives read-your-writes.
+
+    def __init__(self, session_factory, flush_interval=0.005, max_batch=500):
+        self._session_factory = session_factory
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._closed = False
+        # Held while checking for close and queueing, so nothing is queued behind the writer's stop sentinel.
+        self._state_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_forever, name='group-commit-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, mutation):
+        # mutation is called with the writer's session, e.g. lambda session: session.merge(comment).
+        future = Future()
+        with self._state_lock:
+            if self._closed:
+                raise RuntimeError('The writer has been closed')
+            self._queue.put((mutation, future))
+        return future
+
+    def add(self, entity, wait=True):
+        future = self.submit(lambda session: session.merge(entity))
+        if wait:
+            future.result()
+        return future
+
+    def flush(self):
+        # Waits until everything submitted so far has been committed.
+        self.submit(lambda session: None).result()
+
+    def close(self):
+        # Commits everything still queued and stops the writer thread. Writers are not closed at exit on their
+        # own; whoever creates one closes it (init_app registers its writer with atexit).
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _write_forever(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = self._collect(batch)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _collect(self, batch):
+        # Adds whatever arrives within the flush interval of the batch's first mutation to batch. Returns True if
+        # the writer was closed.
+        deadline = time.monotonic() + self._flush_interval
+        try:
+            while len(batch) < self._max_batch:
+                timeout = deadline - time.monotonic()
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                if item is None:
+                    # Drain what was queued before close() so nothing is lost.
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            return True
+                        if item is not None:
+                            batch.append(item)
+                batch.append(item)
+        except queue.Empty:
+            pass
+        return False
+
+    def _commit(self, batch):
+        session = self._session_factory()
+        try:
+            for mutation, _ in batch:
+                mutation(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            session.close()
+            # One bad mutation must not fail the whole group, so fall back to committing them one at a time.
+            self._commit_individually(batch)
+            return
+        session.close()
+        for _, future in batch:
+            future.set_result(None)
+
+    def _commit_individually(self, batch):
+        for mutation, future in batch:
+            session = self._session_factory()
+            try:
+                mutation(session)
+                session.commit()
+                future.set_result(None)
+            except Exception as exception:
+                session.rollback()
+                future.set_exception(exception)
+            finally:
+                session.close()
+
+
+def write_comments_behind(repo, writer):
+    # Replaces the repository's add_comment on the instance with one that commits through writer, and returns once
+    # the comment is committed; add_comments does the same for many comments in one transaction. The comments are
+    # taken out of the request's session, so that session does not insert them a second time.
+    @wraps(repo.add_comment)
+    def add_comment(comment):
+        add_comments([comment])
+
+    def add_comments(comments):
+        comments = list(comments)
+        for comment in comments:
+            # The checks every repository applies to a comment before storing it.
+            AbstractRepository.add_comment(repo, comment)
+            session = object_session(comment)
+            if session is not None:
+                session.expunge(comment)
+        writer.submit(lambda session: [session.merge(comment) for comment in comments]).result()
+
+    repo.add_comment = add_comment
+    repo.add_comments = add_comments
+
+
+def init_app(app, repo):
+    # With WRITE_BEHIND_ENABLED and the database repository, comments are group-committed by one writer. Must run
+    # before anything else wraps the repository's add_comment (e.g. its write events), as it replaces the method.
+    if not app.config.get('WRITE_BEHIND_ENABLED') or app.config.get('REPOSITORY') != 'database':
+        return
+
+    # The writer has an engine of its own. A request waiting for its comment to be committed may hold a connection
+    # of the requests' engine (sqlite_engines keeps a session with pending changes on its single writer
+    # connection), which the writer would otherwise wait for.
+    database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if database_uri.startswith('sqlite:///'):
+        engine = sqlite_engines.create_write_engine(database_uri)
+    else:
+        engine = create_engine(database_uri)
+    session_factory = sessionmaker(bind=engine)
+    writer = GroupCommitWriter(session_factory, app.config.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.005))
+    write_comments_behind(repo, writer)
+    app.extensions['write_behind'] = writer
+    atexit.register(writer.close)
@@ -1,54 +1,123 @@
-from datetime import date
+from functools import lru_cache, wraps
 
 from flask import Blueprint
-from flask import request, render_template, redirect, url_for, session
-
-from better_profanity import profanity
-from flask_wtf import FlaskForm
-from wtforms import StringField, HiddenField, SubmitField
-from wtforms.validators import DataRequired, Length, ValidationError
+from flask import request, render_template, url_for, session, jsonify, abort
 
 import adidas.adapters.repository as repo
-import adidas.utilities.utilities as utilities
+import adidas.utilities.featured_products as featured_products
+import adidas.utilities.navigation as navigation
+import adidas.utilities.fragment_cache as fragment_cache
+import adidas.utilities.metrics as metrics
+import adidas.utilities.profiler as profiler
+import adidas.utilities.readiness as readiness
+from adidas.utilities.readiness import requires_ready
+from adidas.utilities.conditional import conditional_get
+from adidas.utilities import single_flight
+from adidas.adapters import indexes, sqlite_engines, write_behind
+from adidas.adapters.bloom_filter import ProductFilter, is_known_product
+from adidas.adapters.sort_orders import SORT_KEYS
 import adidas.products.services as services
 import adidas.authentication.services as a_services
-import adidas.authentication.authentication
 import adidas.products.services as p_services
-
-from adidas.authentication.authentication import login_required
+import adidas.home.services as home_services
 
 home_blueprint = Blueprint(
     'home_bp', __name__)
 
 
+def login_required(view):
+    # adidas.authentication.authentication imports the authentication forms, and with them flask_wtf and wtforms, so
+    # it is imported when a protected view is first called rather than with the blueprint.
+    @wraps(view)
+    def protected_view(*args, **kwargs):
+        from adidas.authentication.authentication import login_required as authentication_login_required
+
+        return authentication_login_required(view)(*args, **kwargs)
+
+    return protected_view
+
+
+@home_blueprint.record_once
+def init_app(state):
+    # File-backed SQLite databases get a writer connection and a pool of readers; first, as it replaces the
+    # repository instance.
+    sqlite_engines.init_app(state.app)
+    # Comments are group-committed when WRITE_BEHIND_ENABLED is set; before anything else wraps the repository's
+    # add_comment, as it replaces the method.
+    write_behind.init_app(state.app, repo.repo_instance)
+    # Rendered product cards are cached, bounded by FRAGMENT_CACHE_MAX_ENTRIES; before the metrics, which report on
+    # the cache.
+    fragment_cache.init_app(state.app)
+    # Request, repository and cache metrics are exposed on /metrics.
+    metrics.init_app(state.app, lru_caches=[('product_urls_cache', 'product URL cache', product_urls)])
+    # Sampled requests are profiled when PROFILER_SAMPLE_RATE or PROFILER_TOKEN is configured.
+    profiler.init_app(state.app)
+    # Liveness and readiness checks are served on /healthz and /readyz.
+    readiness.init_app(state.app)
+    # Lookups of unknown product ids are answered from a Bloom filter of the catalog's ids, built in the background.
+    false_positive_rate = state.app.config.get('PRODUCT_FILTER_FALSE_POSITIVE_RATE', 0.01)
+    indexes.get_index_in_background(repo.repo_instance, 'product_filter',
+                                    lambda repo_instance: ProductFilter(repo_instance, false_positive_rate))
+    # The derived indexes are warmed on a background thread when POPULATE_IN_BACKGROUND is set, and routes answer
+    # 503 until the stage they need has completed. Otherwise each index is built by the first request needing it.
+    if state.app.config.get('POPULATE_IN_BACKGROUND'):
+        readiness.populate_in_background(state.app, POPULATION_STAGES)
+    # Identical concurrent searches and listings are coalesced, across worker processes if SINGLE_FLIGHT_PATH is set.
+    if state.app.config.get('SINGLE_FLIGHT_PATH'):
+        single_flight.configure(state.app.config['SINGLE_FLIGHT_PATH'])
+
+
+def _warm_home_indexes():
+    featured_products.rotation_slot()
+    home_services.get_best_deals(repo.repo_instance)
+
+
+# Stages run in order, so a route needing a stage also has the ones before it.
+POPULATION_STAGES = [
+    ('home', _warm_home_indexes),
+    ('catalog', lambda: home_services.warm_catalog_indexes(repo.repo_instance)),
+    ('recommendations', lambda: home_services.warm_recommendation_indexes(repo.repo_instance))
+]
+
+
 @home_blueprint.route('/', methods=['GET', 'POST'])
+@requires_ready('home')
+@conditional_get()
 def home():
-    form = SearchForm(request.form)
+    form = search_form_class()(request.form)
     if request.method == 'POST':
         return products_by_name(form)
     return render_template(
         'home/home.html',
-        selected_products=utilities.get_selected_products(),
-        product_urls=utilities.get_names_and_urls(),
+        selected_products=featured_products.get_selected_products(),
+        best_deals=home_services.get_best_deals(repo.repo_instance, limit=6),
+        most_reviewed=home_services.get_most_reviewed(repo.repo_instance, limit=6),
+        product_urls=navigation.get_names_and_urls(),
         form=form
     )
 
 
 @home_blueprint.route('/products_by_name', methods=['GET', 'POST'])
+@requires_ready('catalog')
+@conditional_get()
 def products_by_name(form):
     name = form.name.data
     products_per_page = 3
+    comments_per_page = 10
 
     # Read query parameters.
     cursor = request.args.get('cursor')
     product_to_show_comments = request.args.get('view_comments_for')
+    comments_cursor = request.args.get('comments_cursor')
+    sort = request.args.get('sort')
+
+    if sort is not None and sort not in SORT_KEYS:
+        # An unknown sort key is the client's mistake, not a failure of the listing.
+        abort(400)
 
     if product_to_show_comments is None:
         # No view-comments query parameter, so set to a non-existent product id.
         product_to_show_comments = -1
-    else:
-        # Convert product_to_show_comments from string to int.
-        product_to_show_comments = int(product_to_show_comments)
 
     if cursor is None:
         # No cursor query parameter, so initialise cursor to start at the beginning.
@@ -57,11 +126,25 @@ def products_by_name(form):
         # Convert cursor from string to int.
         cursor = int(cursor)
 
-    # Retrieve product ids for product with genre_name.
-    product_ids = services.get_product_ids_by_name(name, repo.repo_instance)
+    if comments_cursor is None:
+        # No comments cursor query parameter, so show the first page of comments.
+        comments_cursor = 0
+    else:
+        # Convert comments_cursor from string to int.
+        comments_cursor = int(comments_cursor)
+
+    # Retrieve product ids for product with genre_name. Identical searches running at the same time share one
+    # repository call.
+    product_ids = single_flight.coalesce(('product_ids_by_name', name),
+                                         lambda: services.get_product_ids_by_name(name, repo.repo_instance),
+                                         scope=repo.repo_instance)
 
-    # Retrieve the batch of products to display on the Web page.
-    products = services.get_products_by_id(product_ids[cursor:cursor + products_per_page], repo.repo_instance)
+    # Retrieve the batch of products to display on the Web page, in the requested order if there is one.
+    if sort is None:
+        page_ids = product_ids[cursor:cursor + products_per_page]
+    else:
+        page_ids = home_services.sort_product_ids(product_ids, sort, repo.repo_instance, cursor, products_per_page)
+    products = home_services.get_products_by_id(page_ids, repo.repo_instance)
 
     first_product_url = None
     last_product_url = None
@@ -70,25 +153,45 @@ def products_by_name(form):
 
     if cursor > 0:
         # There are preceding products, so generate URLs for the 'previous' and 'first' navigation buttons.
-        prev_product_url = url_for('home_bp.products_by_name', name=name, cursor=cursor - products_per_page)
-        first_product_url = url_for('home_bp.products_by_name', name=name)
+        prev_product_url = url_for('home_bp.products_by_name', name=name, sort=sort,
+                                   cursor=cursor - products_per_page)
+        first_product_url = url_for('home_bp.products_by_name', name=name, sort=sort)
 
     if cursor + products_per_page < len(product_ids):
         # There are further products, so generate URLs for the 'next' and 'last' navigation buttons.
-        next_product_url = url_for('home_bp.products_by_name', name=name, cursor=cursor + products_per_page)
+        next_product_url = url_for('home_bp.products_by_name', name=name, sort=sort,
+                                   cursor=cursor + products_per_page)
 
         last_cursor = products_per_page * int(len(product_ids) / products_per_page)
         if len(product_ids) % products_per_page == 0:
             last_cursor -= products_per_page
-        last_product_url = url_for('home_bp.products_by_name', name=name, cursor=last_cursor)
+        last_product_url = url_for('home_bp.products_by_name', name=name, sort=sort, cursor=last_cursor)
+
+    # The viewer-dependent parts of a product card: logged-in state and collection membership.
+    collection_ids = None
+    if 'username' in session:
+        user = a_services.get_user(session['username'], repo.repo_instance)
+        collection_ids = set(product['id'] for product in user['collection'])
+    catalog_version = indexes.catalog_version(repo.repo_instance)
 
     # Construct urls for viewing product comments and adding comments.
     for product in products:
-        product['view_comment_url'] = url_for('home_bp.products_by_name', name=name, cursor=cursor,
+        product['view_comment_url'] = url_for('home_bp.products_by_name', name=name, sort=sort, cursor=cursor,
                                               view_comments_for=product['id'])
-        product['add_comment_url'] = url_for('products_bp.comment_on_product', product=product['id'])
-        product['add_to_collection'] = url_for('home_bp.add_to_collection', product=product['id'])
-        product['remove_from_collection'] = url_for('home_bp.remove_from_collection', product=product['id'])
+        product.update(product_urls(request.script_root, product['id']))
+        product['in_collection'] = collection_ids is not None and product['id'] in collection_ids
+        product['card'] = fragment_cache.render_product_card(product, (
+            'listing', product['id'], catalog_version, product['number_of_comments'], collection_ids is not None,
+            product['in_collection'], request.script_root, name, sort, cursor))
+
+        if product['id'] == product_to_show_comments:
+            # Only the product whose comments are being viewed has a page of its comments fetched.
+            product['comments'] = home_services.get_comments_for_product(
+                product['id'], repo.repo_instance, comments_cursor, comments_per_page)
+            if comments_cursor + comments_per_page < product['number_of_comments']:
+                product['more_comments_url'] = url_for('home_bp.products_by_name', name=name, sort=sort,
+                                                       cursor=cursor, view_comments_for=product['id'],
+                                                       comments_cursor=comments_cursor + comments_per_page)
 
     # Generate the webpage to display the products.
     return render_template(
@@ -97,10 +200,10 @@ def products_by_name(form):
         products=products,
         form=form,
         products_title='Product name: ' + name,
-        selected_products=utilities.get_selected_products(len(products) * 2),
+        selected_products=featured_products.get_selected_products(len(products) * 2),
         handler_url=url_for('home_bp.products_by_name'),
-        name_urls=utilities.get_names_and_urls(),
-        brand_urls=utilities.get_brands_and_urls(),
+        name_urls=navigation.get_names_and_urls(),
+        brand_urls=navigation.get_brands_and_urls(),
         first_product_url=first_product_url,
         last_product_url=last_product_url,
         prev_product_url=prev_product_url,
@@ -109,7 +212,110 @@ def products_by_name(form):
     )
 
 
+@home_blueprint.route('/recent_comments', methods=['GET'])
+@requires_ready('catalog')
+def recent_comments():
+    comments_per_page = 10
+
+    # Read query parameters.
+    cursor = request.args.get('cursor')
+    brand_name = request.args.get('brand')
+
+    if cursor is None:
+        # No cursor query parameter, so initialise cursor to start at the newest comment.
+        cursor = 0
+    else:
+        # Convert cursor from string to int.
+        cursor = int(cursor)
+
+    # Fetch one comment beyond the page to find out whether there is a next page.
+    comments = home_services.get_recent_comments(repo.repo_instance, cursor, comments_per_page + 1, brand_name)
+
+    next_comments_url = None
+    if len(comments) > comments_per_page:
+        next_comments_url = url_for('home_bp.recent_comments', brand=brand_name, cursor=cursor + comments_per_page)
+
+    return jsonify(
+        comments=comments[:comments_per_page],
+        brand=brand_name,
+        next_comments_url=next_comments_url
+    )
+
+
+@home_blueprint.route('/suggest', methods=['GET'])
+@requires_ready('catalog')
+def suggest():
+    # Autocomplete for the search form.
+    prefix = request.args.get('q', '')
+    suggestions = home_services.get_suggestions(prefix, repo.repo_instance)
+    for suggestion in suggestions:
+        if suggestion['kind'] == 'brand':
+            suggestion['url'] = url_for('products_bp.products_by_brand', brand=suggestion['text'])
+
+    response = jsonify(query=prefix, suggestions=suggestions)
+    response.cache_control.max_age = 60
+    return response
+
+
+@home_blueprint.route('/products_by_facets', methods=['GET'])
+@requires_ready('catalog')
+def products_by_facets():
+    products_per_page = 10
+
+    # Read query parameters; each facet may be given several times, e.g. brand=ORIGINALS&brand=CORE / NEO.
+    selection = {facet: request.args.getlist(facet) for facet in ('brand', 'price_band', 'discount')}
+    cursor = request.args.get('cursor')
+
+    if cursor is None:
+        # No cursor query parameter, so initialise cursor to start at the beginning.
+        cursor = 0
+    else:
+        # Convert cursor from string to int.
+        cursor = int(cursor)
+
+    products, number_of_matches, facet_counts = home_services.get_products_by_facets(
+        selection, repo.repo_instance, cursor, products_per_page)
+
+    next_products_url = None
+    if cursor + products_per_page < number_of_matches:
+        next_products_url = url_for('home_bp.products_by_facets', cursor=cursor + products_per_page, **selection)
+
+    return jsonify(
+        products=products,
+        number_of_matches=number_of_matches,
+        facets=facet_counts,
+        next_products_url=next_products_url
+    )
+
+
+@home_blueprint.route('/similar_products', methods=['GET'])
+@requires_ready('recommendations')
+def similar_products():
+    # Related-item suggestions for a product page.
+    product_id = request.args.get('product')
+    try:
+        products = home_services.get_similar_products(product_id, repo.repo_instance)
+    except home_services.NonExistentProductException:
+        abort(404)
+    for product in products:
+        product.update(product_urls(request.script_root, product['id']))
+
+    response = jsonify(product=product_id, similar_products=products)
+    response.cache_control.max_age = 60
+    return response
+
+
+@home_blueprint.route('/analytics/brands', methods=['GET'])
+@requires_ready('recommendations')
+def brand_analytics():
+    # Per-brand pricing, discount and comment figures for merchandising.
+    response = jsonify(brands=home_services.get_brand_analytics(repo.repo_instance))
+    response.cache_control.max_age = 60
+    return response
+
+
 @home_blueprint.route('/collection', methods=['GET', 'POST'])
+@requires_ready('home')
 @login_required
 def collection():
     # Obtain the username of the currently logged in user.
@@ -118,26 +324,37 @@ def collection():
     products = user['collection']
     for product in products:
         product['remove_from_collection'] = url_for('home_bp.remove_from_collection', product=product['id'])
+    recommended_products = home_services.get_recommended_products(
+        [product['id'] for product in products], repo.repo_instance)
 
     return render_template(
         'products/collection.html',
         title='Collection of ' + username,
         collection=user['collection'],
+        collection_cards=_collection_cards(user['collection']),
         handler_url=url_for('products_bp.comment_on_product'),
-        selected_products=utilities.get_selected_products(),
-        brand_urls=utilities.get_brands_and_urls(),
+        selected_products=featured_products.get_selected_products(),
+        recommended_products=recommended_products,
+        brand_urls=navigation.get_brands_and_urls(),
         user=user
     )
 
 
 @home_blueprint.route('/collection/added', methods=['GET', 'POST'])
+@requires_ready('home')
 @login_required
 def add_to_collection():
     # Obtain the username of the currently logged in user.
     username = session['username']
     user = a_services.get_user(username, repo.repo_instance)
     product_id = request.args.get('product')
-    product = p_services.get_product(product_id, repo.repo_instance)
+    # The product filter rules most unknown ids out without a lookup; the rest are found missing by the repository.
+    if not is_known_product(product_id, repo.repo_instance):
+        abort(404)
+    try:
+        product = p_services.get_product(product_id, repo.repo_instance)
+    except p_services.NonExistentProductException:
+        abort(404)
     product['remove_from_collection'] = url_for('home_bp.remove_from_collection', product=product['id'])
     if product not in user['collection']:
         user['collection'].append(product)
@@ -146,21 +363,29 @@ def add_to_collection():
         'products/collection.html',
         title='Collection of ' + username,
         collection=user['collection'],
+        collection_cards=_collection_cards(user['collection']),
         handler_url=url_for('products_bp.comment_on_product'),
-        selected_products=utilities.get_selected_products(),
-        brand_urls=utilities.get_brands_and_urls(),
+        selected_products=featured_products.get_selected_products(),
+        brand_urls=navigation.get_brands_and_urls(),
         user=user
     )
 
 
 @home_blueprint.route('/collection/removed', methods=['GET', 'POST'])
+@requires_ready('home')
 @login_required
 def remove_from_collection():
     # Obtain the username of the currently logged in user.
     username = session['username']
     user = a_services.get_user(username, repo.repo_instance)
     product_id = request.args.get('product')
-    product = p_services.get_product(product_id, repo.repo_instance)
+    # The product filter rules most unknown ids out without a lookup; the rest are found missing by the repository.
+    if not is_known_product(product_id, repo.repo_instance):
+        abort(404)
+    try:
+        product = p_services.get_product(product_id, repo.repo_instance)
+    except p_services.NonExistentProductException:
+        abort(404)
     product['remove_from_collection'] = url_for('home_bp.remove_from_collection', product=product['id'])
     if product in user['collection']:
         user['collection'].remove(product)
@@ -168,14 +393,56 @@ def remove_from_collection():
         'products/collection.html',
         title='Collection of ' + username,
         collection=user['collection'],
+        collection_cards=_collection_cards(user['collection']),
         handler_url=url_for('products_bp.comment_on_product'),
-        selected_products=utilities.get_selected_products(),
-        brand_urls=utilities.get_brands_and_urls(),
+        selected_products=featured_products.get_selected_products(),
+        brand_urls=navigation.get_brands_and_urls(),
         user=user
     )
 
 
-class SearchForm(FlaskForm):
-    name = StringField('Name', [
-        DataRequired()])
-    submit = SubmitField('Search')
+def _collection_cards(collection):
+    # The rendered cards of a user's collection. The collection's product dicts are compared by value when products
+    # are added and removed, so the cards are rendered from copies.
+    catalog_version = indexes.catalog_version(repo.repo_instance)
+    cards = []
+    for product in collection:
+        card_product = dict(product, in_collection=True)
+        card_product.update(product_urls(request.script_root, product['id']))
+        cards.append(fragment_cache.render_product_card(card_product, (
+            'collection', product['id'], catalog_version, product['number_of_comments'], request.script_root)))
+    return cards
+
+
+@lru_cache(maxsize=4096)
+def product_urls(script_root, product_id):
+    # The urls for a product's card depend only on the product id (and the application root), so they are
+    # generated once per product rather than on every listing request.
+    return {
+        'add_comment_url': url_for('products_bp.comment_on_product', product=product_id),
+        'add_to_collection': url_for('home_bp.add_to_collection', product=product_id),
+        'remove_from_collection': url_for('home_bp.remove_from_collection', product=product_id)
+    }
+
+
+@lru_cache(maxsize=None)
+def search_form_class():
+    # WTForms and Flask-WTF are imported on first use rather than when the blueprint is imported, which keeps
+    # them out of the start-up time of workers and CLI commands that never render the search form.
+    from flask_wtf import FlaskForm
+    from wtforms import StringField, SubmitField
+    from wtforms.validators import DataRequired
+
+    class SearchForm(FlaskForm):
+        name = StringField('Name', [
+            DataRequired()])
+        submit = SubmitField('Search')
+
+    return SearchForm
+
+
+def __getattr__(name):
+    # Keeps "from adidas.home.home import SearchForm" working now that the form class is created lazily.
+    if name == 'SearchForm':
+        return search_form_class()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -1,7 +1,15 @@
-from typing import List, Iterable
-
+from itertools import islice
+from typing import Iterable
+
+from adidas.adapters import events, indexes
+from adidas.adapters.bloom_filter import is_known_product
+from adidas.adapters.comment_feed import build_recent_comments_feed
+from adidas.adapters.prefix_index import build_prefix_index
+from adidas.adapters.sort_orders import SORT_KEYS, build_sort_orders
+from adidas.adapters.rankings import get_rankings
 from adidas.adapters.repository import AbstractRepository
 from adidas.domain.model import make_comment, Product, Comment, Brand
+from adidas.utilities.single_flight import coalesce
 
 
 class NonExistentProductException(Exception):
@@ -12,13 +20,17 @@ class UnknownUserException(Exception):
     pass
 
 
+class InvalidCommentException(Exception):
+    pass
+
+
 def add_comment(product_id: int, comment_text: str, username: str, repo: AbstractRepository):
     # Check that the product exists.
-    product = repo.get_product(product_id)
+    product = _get_known_product(product_id, repo)
     if product is None:
         raise NonExistentProductException
 
-    user = repo.get_user(username)
+    user = _get_commenting_user(username, product_id, repo)
     if user is None:
         raise UnknownUserException
 
@@ -29,8 +41,85 @@ def add_comment(product_id: int, comment_text: str, username: str, repo: Abstrac
     repo.add_comment(comment)
 
 
+def add_comments(comments: Iterable, repo: AbstractRepository, chunk_size=500):
+    # Adds many comments, each a (product_id, comment_text, username) tuple, e.g. when importing historical
+    # reviews. Comments are processed in chunks: the products and users of a chunk are looked up once each, with
+    # products fetched in a single get_products_by_id call, and the chunk's comments are stored together. A bad
+    # comment does not stop the import; returns a list of (position, exception) pairs for the comments that could
+    # not be added.
+    failures = list()
+    users = dict()
+    position = 0
+    comments = iter(comments)
+
+    while True:
+        chunk = list(islice(comments, chunk_size))
+        if len(chunk) == 0:
+            return failures
+
+        product_ids = list(set(product_id for product_id, _, _ in chunk if is_known_product(product_id, repo)))
+        # Keyed by the products' own ids, as repositories may leave unknown ids out of the result.
+        products = {product.id: product for product in repo.get_products_by_id(product_ids) if product is not None}
+        for product_id, _, username in chunk:
+            user_key = _commenting_user_key(username, product_id, repo)
+            if user_key not in users and product_id in products:
+                users[user_key] = _get_commenting_user(username, product_id, repo)
+
+        new_comments = list()
+        for product_id, comment_text, username in chunk:
+            try:
+                if comment_text is None or len(comment_text.strip()) == 0:
+                    raise InvalidCommentException
+                product = products.get(product_id)
+                if product is None:
+                    raise NonExistentProductException
+                user = users[_commenting_user_key(username, product_id, repo)]
+                if user is None:
+                    raise UnknownUserException
+
+                new_comments.append(make_comment(comment_text, user, product))
+            except (InvalidCommentException, NonExistentProductException, UnknownUserException) as exception:
+                failures.append((position, exception))
+            position += 1
+
+        _store_comments(new_comments, repo)
+
+
+def _get_commenting_user(username, product_id, repo: AbstractRepository):
+    # Repositories keeping a copy of each user per shard (e.g. the sharded repository) need comments made with the
+    # copy on the product's shard.
+    get_user_for_product = getattr(repo, 'get_user_for_product', None)
+    if get_user_for_product is not None:
+        return get_user_for_product(username, product_id)
+    return repo.get_user(username)
+
+
+def _commenting_user_key(username, product_id, repo: AbstractRepository):
+    if hasattr(repo, 'shard_for'):
+        return username, id(repo.shard_for(product_id))
+    return username
+
+
+def _store_comments(comments, repo: AbstractRepository):
+    # Repositories with an add_comments method (e.g. the database repository with write-behind enabled) store a
+    # chunk in one transaction; the others add the comments one at a time.
+    add_comments = getattr(repo, 'add_comments', None)
+    if add_comments is not None:
+        add_comments(comments)
+    else:
+        for comment in comments:
+            repo.add_comment(comment)
+
+
+def _get_known_product(product_id, repo: AbstractRepository):
+    # Ids that the product filter rules out are answered without a repository lookup.
+    if not is_known_product(product_id, repo):
+        return None
+    return repo.get_product(product_id)
+
+
 def get_product(product_id: int, repo: AbstractRepository):
-    product = repo.get_product(product_id)
+    product = _get_known_product(product_id, repo)
 
     if product is None:
         raise NonExistentProductException
@@ -51,28 +140,100 @@ def get_last_product(repo: AbstractRepository):
     return product_to_dict(product)
 
 
+def get_best_deals(repo: AbstractRepository, limit=10, brand_name=None):
+    # Returns the limit products with the highest discount, overall or for one brand.
+    product_ids = get_rankings(repo).best_deals.top(limit, brand_name)
+
+    return products_to_dict(repo.get_products_by_id(product_ids))
+
+
+def get_most_reviewed(repo: AbstractRepository, limit=10, brand_name=None):
+    # Returns the limit products with the most comments, overall or for one brand.
+    product_ids = get_rankings(repo).most_reviewed.top(limit, brand_name)
+
+    return products_to_dict(repo.get_products_by_id(product_ids))
+
+
+def update_product_price(product_id, price, discount, repo: AbstractRepository):
+    # Sets a product's price and discount, e.g. from a price sync, and brings the indexes derived from them up to
+    # date.
+    product = _get_known_product(product_id, repo)
+    if product is None:
+        raise NonExistentProductException
+
+    product.price = price
+    product.discount = discount
+    product_changed(product_id, repo)
+
+
+def product_changed(product_id, repo: AbstractRepository):
+    # Called after a product's price or discount has been changed in the repository. The change is published to
+    # the indexes that follow the repository's writes (rankings, similar products, catalog version).
+    product = _get_known_product(product_id, repo)
+    if product is None:
+        raise NonExistentProductException
+
+    events.publish(repo, events.PRODUCT_CHANGED, product)
+
+
+def get_similar_products(product_id, repo: AbstractRepository, limit=5):
+    # Returns the limit products most similar to the product with product_id, most similar first.
+    if _get_known_product(product_id, repo) is None:
+        raise NonExistentProductException
+
+    product_ids = _similarity_index(repo).similar(product_id, limit)
+    return products_to_dict(repo.get_products_by_id(product_ids))
+
+
+def get_recommended_products(product_ids, repo: AbstractRepository, limit=5):
+    # Returns the limit products most similar to the given products taken together, e.g. a user's collection. Until
+    # the similarity index has been built in the background there are no recommendations.
+    from adidas.adapters.similar_products import get_built_similarity_index
+
+    similarity_index = get_built_similarity_index(repo)
+    if similarity_index is None:
+        return []
+    recommended_ids = similarity_index.recommend(product_ids, limit)
+    return products_to_dict(repo.get_products_by_id(recommended_ids))
+
+
+def _similarity_index(repo: AbstractRepository):
+    # NumPy and SciPy are imported on first use, which keeps them out of the start-up time of workers and CLI
+    # commands that never serve recommendations.
+    from adidas.adapters.similar_products import get_similarity_index
+
+    return get_similarity_index(repo)
+
+
 def get_products_by_price(price, repo: AbstractRepository):
     # Returns products for the target price (empty if no matches), the price of the previous product (might be null), the price of the next product (might be null)
 
-    products = repo.get_products_by_price(target_price=price)
+    def lookup():
+        products = repo.get_products_by_price(target_price=price)
 
-    products_dto = list()
-    prev_price = next_price = None
+        products_dto = list()
+        prev_price = next_price = None
 
-    if len(products) > 0:
-        prev_price = repo.get_price_of_previous_product(products[0])
-        next_price = repo.get_price_of_next_product(products[0])
+        if len(products) > 0:
+            prev_price = repo.get_price_of_previous_product(products[0])
+            next_price = repo.get_price_of_next_product(products[0])
 
-        # Convert Products to dictionary form.
-        products_dto = products_to_dict(products)
+            # Convert Products to dictionary form.
+            products_dto = products_to_dict(products)
 
-    return products_dto, prev_price, next_price
+        return products_dto, prev_price, next_price
+
+    # Concurrent lookups of the same price share one computation; each caller gets its own copies of the dicts.
+    products_dto, prev_price, next_price = coalesce(('products_by_price', price), lookup, scope=repo)
+    return [dict(product) for product in products_dto], prev_price, next_price
 
 
 def get_product_ids_for_brand(brand_name, repo: AbstractRepository):
-    product_ids = repo.get_product_ids_for_brand(brand_name)
+    # Concurrent listings of the same brand share one repository call.
+    product_ids = coalesce(('product_ids_for_brand', brand_name), lambda: repo.get_product_ids_for_brand(brand_name),
+                           scope=repo)
 
-    return product_ids
+    return list(product_ids)
 
 
 def get_products_by_id(id_list, repo: AbstractRepository):
@@ -84,13 +245,95 @@ def get_products_by_id(id_list, repo: AbstractRepository):
     return products_as_dict
 
 
-def get_comments_for_product(product_id, repo: AbstractRepository):
-    product = repo.get_product(product_id)
+def get_comments_for_product(product_id, repo: AbstractRepository, cursor=0, limit=None):
+    # Returns the product's comments in timestamp order, starting at cursor. When limit is given only that many
+    # comments are converted, so a page of comments costs O(limit) regardless of how popular the product is.
+    product = _get_known_product(product_id, repo)
 
     if product is None:
         raise NonExistentProductException
 
-    return comments_to_dict(product.comments)
+    stop = None if limit is None else cursor + limit
+    return comments_to_dict(islice(product.comments, cursor, stop))
+
+
+def get_recent_comments(repo: AbstractRepository, cursor=0, limit=10, brand_name=None):
+    # Returns a page of the most recent comments across all products, newest first, optionally restricted to
+    # products of one brand. Only the most recent comments (the feed's capacity) are available.
+    feed = indexes.get_index(repo, 'recent_comments', build_recent_comments_feed)
+
+    return comments_to_dict(feed.get_comments(cursor, limit, brand_name))
+
+
+def get_suggestions(prefix, repo: AbstractRepository, limit=10):
+    # Returns up to limit product names and brands starting with prefix (at any word), most popular first. The
+    # index is rebuilt when the catalog changes.
+    prefix_index = _versioned_index(repo, 'suggestions', build_prefix_index)
+
+    return [{'text': text, 'kind': kind} for text, kind, _ in prefix_index.suggest(prefix, limit)]
+
+
+def warm_catalog_indexes(repo: AbstractRepository):
+    # Builds the indexes behind listings, search and the comment feed, which are otherwise built by the first
+    # request that needs them.
+    _versioned_index(repo, 'sort_orders', build_sort_orders)
+    _versioned_index(repo, 'suggestions', build_prefix_index)
+    _versioned_index(repo, 'facets', _build_facet_index)
+    indexes.get_index(repo, 'recent_comments', build_recent_comments_feed)
+
+
+def warm_recommendation_indexes(repo: AbstractRepository):
+    _similarity_index(repo)
+    get_brand_analytics(repo)
+
+
+def _versioned_index(repo: AbstractRepository, name, build):
+    # Returns the named index for repo, rebuilding it whenever the catalog version has changed.
+    version = indexes.catalog_version(repo)
+    holder = indexes.get_index(repo, name, lambda repo_instance: dict())
+    if holder.get('version') != version:
+        holder['index'] = build(repo)
+        holder['version'] = version
+    return holder['index']
+
+
+def get_products_by_facets(selection, repo: AbstractRepository, cursor=0, limit=10):
+    # selection maps facet names ('brand', 'price_band', 'discount') to the values chosen in each. Returns the page
+    # of matching products, the total number of matches and the number of matches for every facet value.
+    facet_index = _versioned_index(repo, 'facets', _build_facet_index)
+    product_ids, number_of_matches, facet_counts = facet_index.search(selection, cursor, limit)
+
+    return products_to_dict(repo.get_products_by_id(product_ids)), number_of_matches, facet_counts
+
+
+def _build_facet_index(repo: AbstractRepository):
+    # NumPy is imported on first use, like the similarity index.
+    from adidas.adapters.facet_index import build_facet_index
+
+    return build_facet_index(repo)
+
+
+def sort_product_ids(product_ids, sort_key, repo: AbstractRepository, cursor=0, limit=None):
+    # Returns the page of product_ids from cursor in the order given by sort_key (one of SORT_KEYS), using orderings
+    # precomputed for the catalog rather than sorting the products on each request.
+    if sort_key not in SORT_KEYS:
+        raise ValueError('Unknown sort key: {}'.format(sort_key))
+
+    sort_orders = _versioned_index(repo, 'sort_orders', build_sort_orders)
+    return sort_orders.sort(product_ids, sort_key, cursor, limit)
+
+
+def get_brand_analytics(repo: AbstractRepository):
+    # Returns per-brand product and comment counts, price and discount statistics and band counts. The columns
+    # behind them are rebuilt when the catalog changes; new comments are counted into them as they are added.
+    return _versioned_index(repo, 'catalog_analytics', _build_catalog_analytics).brand_summaries()
+
+
+def _build_catalog_analytics(repo: AbstractRepository):
+    # NumPy is imported on first use, like the similarity index.
+    from adidas.adapters.catalog_analytics import build_catalog_analytics
+
+    return build_catalog_analytics(repo)
 
 
 # ============================================
@@ -105,7 +348,7 @@ def product_to_dict(product: Product):
         'description': product.description,
         'hyperlink': product.hyperlink,
         'image_hyperlink': product.image_hyperlink,
-        'comments': comments_to_dict(product.comments),
+        'number_of_comments': product.number_of_comments,
         'brand': brand_to_dict(product.brand)
     }
     return product_dict
@@ -0,0 +1,57 @@
+import hashlib
+from functools import wraps
+
+from flask import request, session, make_response, current_app
+
+import adidas.adapters.repository as repo
+from adidas.utilities import featured_products
+
+
+def make_etag(*version_parts):
+    # Pages differ for logged-in users, so the username is part of every tag.
+    parts = version_parts + (session.get('username'),)
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def catalog_validators(*args, **kwargs):
+    # The tag of pages built from the whole catalog and its comments, e.g. listings and the home page, which also
+    # show the current slice of featured products. It is made from what the repository holds rather than from
+    # counters kept by this process, so every worker tags the same pages alike.
+    repo_instance = repo.repo_instance
+    comments = repo_instance.get_comments()
+    latest_comment = max((comment.timestamp for comment in comments), default=None)
+    return make_etag(repo_instance.get_number_of_products(), len(comments), latest_comment,
+                     featured_products.rotation_slot(), request.full_path)
+
+
+def conditional_get(validators=catalog_validators):
+    # Answers GET requests whose If-None-Match matches the current tag with a 304 before the view does any
+    # repository or template work.
+    def decorator(view):
+        @wraps(view)
+        def conditional_view(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            etag = validators(*args, **kwargs)
+            not_modified = request.if_none_match.contains(etag)
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            # The session cookie decides who is logged in, so caches must keep separate copies per cookie and
+            # shared caches must not store pages for logged-in users.
+            response.vary.add('Cookie')
+            response.cache_control.no_cache = True
+            if 'username' in session:
+                response.cache_control.private = True
+            return response
+
+        return conditional_view
+
+    return decorator
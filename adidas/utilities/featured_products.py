@@ -0,0 +1,102 @@
+import heapq
+import random
+import time
+from threading import Lock, Thread
+
+from flask import current_app
+
+import adidas.adapters.repository as repo
+import adidas.home.services as services
+from adidas.adapters import indexes
+
+
+class FeaturedProductsPool:
+    # A pool of pre-serialised featured products. The slice served rotates every rotation_interval seconds; once the
+    # pool is older than refresh_interval seconds a new one is drawn on a background thread while the old one is
+    # served. The ids in the pool and the rotation slot identify the slice, so pages can be revalidated with them.
+
+    def __init__(self, repo, pool_size=30, refresh_interval=60, rotation_interval=10, clock=time.time):
+        self._repo = repo
+        self._pool_size = pool_size
+        self._refresh_interval = refresh_interval
+        self._rotation_interval = rotation_interval
+        self._clock = clock
+        self._products = self._draw()
+        self._drawn_at = time.monotonic()
+        self._refreshing = False
+        self._lock = Lock()
+
+    @property
+    def size(self):
+        return len(self._products)
+
+    @property
+    def age(self):
+        # Seconds since the pool being served was drawn.
+        return time.monotonic() - self._drawn_at
+
+    def rotation_slot(self):
+        self._refresh_if_stale()
+        return tuple(product['id'] for product in self._products), int(self._clock() // self._rotation_interval)
+
+    def get_selected_products(self, quantity=3):
+        self._refresh_if_stale()
+        products = self._products
+        if len(products) == 0:
+            return []
+        quantity = min(quantity, len(products))
+        start = int(self._clock() // self._rotation_interval) * quantity % len(products)
+        selected = products[start:start + quantity]
+        if len(selected) < quantity:
+            selected = selected + products[:quantity - len(selected)]
+        # Callers add their own URLs to the dicts, so hand out copies.
+        return [dict(product) for product in selected]
+
+    def _refresh_if_stale(self):
+        if time.monotonic() - self._drawn_at < self._refresh_interval:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self._products = self._draw()
+            self._drawn_at = time.monotonic()
+        finally:
+            self._refreshing = False
+
+    def _draw(self):
+        # Weighted sampling without replacement: each product gets the key u ** (1 / weight) and the largest keys
+        # win, so heavily discounted products are featured more often without excluding the rest.
+        products = (product for brand in self._repo.get_brands() for product in brand.branded_products)
+        drawn = heapq.nlargest(self._pool_size, products,
+                               key=lambda product: random.random() ** (1.0 / _weight_of(product)))
+        return services.products_to_dict(drawn)
+
+
+def _weight_of(product):
+    discount = product.discount if product.discount is not None else 0
+    return 1 + max(discount, 0)
+
+
+def get_pool():
+    def build(repo_instance):
+        return FeaturedProductsPool(
+            repo_instance,
+            pool_size=current_app.config.get('FEATURED_PRODUCTS_POOL_SIZE', 30),
+            refresh_interval=current_app.config.get('FEATURED_PRODUCTS_REFRESH_INTERVAL', 60),
+            rotation_interval=current_app.config.get('FEATURED_PRODUCTS_ROTATION_INTERVAL', 10)
+        )
+
+    return indexes.get_index(repo.repo_instance, 'featured_products', build)
+
+
+def get_selected_products(quantity=3):
+    return get_pool().get_selected_products(quantity)
+
+
+def rotation_slot():
+    return get_pool().rotation_slot()
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from threading import Lock
+
+from flask import current_app, render_template
+from markupsafe import Markup
+
+
+class FragmentCache:
+    # A bounded LRU cache of rendered template fragments with hit and miss counters.
+
+    def __init__(self, max_entries=5000):
+        self._max_entries = max_entries
+        self._fragments = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+
+        # Rendered outside the lock; two threads rendering the same fragment at once both store the same result.
+        fragment = render()
+        with self._lock:
+            self._fragments[key] = fragment
+            while len(self._fragments) > self._max_entries:
+                self._fragments.popitem(last=False)
+                self.evictions += 1
+        return fragment
+
+    def __len__(self):
+        return len(self._fragments)
+
+
+def init_app(app):
+    app.extensions['fragment_cache'] = FragmentCache(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000))
+
+
+def get_fragment_cache(app):
+    return app.extensions.get('fragment_cache')
+
+
+def render_product_card(product, key):
+    # Returns the product's rendered card. key must cover everything the card shows: the product id, the catalog
+    # version and comment count, the viewer (logged-in state, collection membership) and the page its links point
+    # back to.
+    def render():
+        return Markup(render_template('products/product_card.html', product=product))
+
+    fragment_cache = get_fragment_cache(current_app)
+    if fragment_cache is None:
+        return render()
+    return fragment_cache.get_or_render(key, render)
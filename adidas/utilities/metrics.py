@@ -0,0 +1,282 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from functools import wraps
+
+from flask import g, request, Response
+
+import adidas.adapters.repository as repo
+from adidas.adapters.repository import AbstractRepository
+from adidas.utilities import featured_products, navigation, single_flight
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ShardedMetric:
+    # Each thread updates its own shard, so recording a value takes no lock; shards are summed when scraped. When a
+    # thread exits, its shard is merged into the retired totals, so short-lived threads do not accumulate shards.
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = dict()
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            # The owner lives in the thread's local storage, which is cleared when the thread exits.
+            owner = self._local.owner = _ShardOwner()
+            with self._shards_lock:
+                self._shards.append(owner.shard)
+            weakref.finalize(owner, self._retire, owner.shard).atexit = False
+        return owner.shard
+
+    def _retire(self, shard):
+        with self._shards_lock:
+            self._shards.remove(shard)
+            for label_values, value in shard.items():
+                self._retired[label_values] = self._merge(self._retired.get(label_values), value)
+
+    def _merge(self, total, value):
+        raise NotImplementedError
+
+    def _snapshots(self):
+        with self._shards_lock:
+            shards = [self._retired] + self._shards
+            return [list(shard.items()) for shard in shards]
+
+    def _labels(self, label_values, extra=()):
+        pairs = list(zip(self.label_names, label_values)) + list(extra)
+        if len(pairs) == 0:
+            return ''
+        return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + '}'
+
+
+class _ShardOwner:
+    def __init__(self):
+        self.shard = dict()
+
+
+class Counter(_ShardedMetric):
+    type_name = 'counter'
+
+    def _merge(self, total, value):
+        return value if total is None else total + value
+
+    def inc(self, *label_values, amount=1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def values(self):
+        totals = dict()
+        for snapshot in self._snapshots():
+            for label_values, value in snapshot:
+                totals[label_values] = totals.get(label_values, 0) + value
+        return totals
+
+    def samples(self):
+        for label_values, value in sorted(self.values().items()):
+            yield self.name + self._labels(label_values), value
+
+
+class Histogram(_ShardedMetric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def _merge(self, total, counts):
+        return list(counts) if total is None else [count + other for count, other in zip(total, counts)]
+
+    def observe(self, value, *label_values):
+        shard = self._shard()
+        counts = shard.get(label_values)
+        if counts is None:
+            # One count per bucket plus the +Inf bucket, followed by the sum of observed values.
+            counts = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def samples(self):
+        totals = dict()
+        for snapshot in self._snapshots():
+            for label_values, counts in snapshot:
+                total = totals.setdefault(label_values, [0] * len(counts))
+                for index, count in enumerate(counts):
+                    total[index] += count
+
+        for label_values, counts in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield self.name + '_bucket' + self._labels(label_values, [('le', le)]), cumulative
+            yield self.name + '_sum' + self._labels(label_values), counts[-1]
+            yield self.name + '_count' + self._labels(label_values), cumulative
+
+
+class Gauge:
+    # A value read from a callback when scraped, e.g. a cache hit ratio kept by the cache itself.
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self._read = read
+
+    def samples(self):
+        value = self._read()
+        if value is not None:
+            yield self.name, value
+
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self._histogram = histogram
+        self._label_values = label_values
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start, *self._label_values)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self.request_latency = self.register(Histogram(
+            'adidas_request_duration_seconds', 'Request latency by endpoint.', ['endpoint']))
+        self.requests = self.register(Counter(
+            'adidas_requests_total', 'Requests by endpoint and status code.', ['endpoint', 'status']))
+        self.repository_latency = self.register(Histogram(
+            'adidas_repository_duration_seconds', 'Repository call latency by method.', ['method']))
+        self.populate_seconds = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def set_populate_duration(self, seconds):
+        self.populate_seconds = seconds
+
+    def exposition(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type_name))
+            for name, value in metric.samples():
+                lines.append('{} {}'.format(name, _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+def time_repository(repository, histogram):
+    # Replaces the repository's methods on the instance with timed versions, so the repository keeps its type
+    # and identity (derived indexes are keyed on it).
+    if getattr(repository, '_metrics_timed', False):
+        return
+    for name in sorted(AbstractRepository.__abstractmethods__):
+        method = getattr(repository, name)
+        setattr(repository, name, _timed(method, histogram, name))
+    repository._metrics_timed = True
+
+
+def _timed(method, histogram, name):
+    @wraps(method)
+    def timed(*args, **kwargs):
+        with histogram.time(name):
+            return method(*args, **kwargs)
+
+    return timed
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _lru_cache_hit_rate(function):
+    info = function.cache_info()
+    lookups = info.hits + info.misses
+    return info.hits / lookups if lookups > 0 else 0.0
+
+
+def _if_repository(read):
+    # Gauges of indexes kept per repository have no value until there is a repository.
+    return lambda: read() if repo.repo_instance is not None else None
+
+
+def init_app(app, lru_caches=()):
+    # lru_caches lists (name, description, function) for functions cached with functools.lru_cache, whose hit
+    # ratios and sizes are reported as adidas_<name>_hit_ratio and adidas_<name>_entries.
+    registry = MetricsRegistry()
+    app.extensions['metrics'] = registry
+
+    registry.register(Gauge('adidas_populate_duration_seconds', 'Time taken to populate the indexes.',
+                            lambda: registry.populate_seconds))
+    fragment_cache = app.extensions.get('fragment_cache')
+    if fragment_cache is not None:
+        registry.register(Gauge('adidas_fragment_cache_hit_ratio', 'Hit ratio of the product card cache.',
+                                lambda: fragment_cache.hit_rate))
+        registry.register(Gauge('adidas_fragment_cache_entries', 'Entries in the product card cache.',
+                                lambda: len(fragment_cache)))
+    for name, description, function in lru_caches:
+        registry.register(Gauge('adidas_{}_hit_ratio'.format(name), 'Hit ratio of the {}.'.format(description),
+                                lambda function=function: _lru_cache_hit_rate(function)))
+        registry.register(Gauge('adidas_{}_entries'.format(name), 'Entries in the {}.'.format(description),
+                                lambda function=function: function.cache_info().currsize))
+
+    # The navigation cache and the featured products pool are read when scraped, within the /metrics request.
+    registry.register(Gauge('adidas_navigation_cache_hit_ratio', 'Hit ratio of the navigation link cache.',
+                            _if_repository(lambda: navigation.get_cache(repo.repo_instance).hit_rate)))
+    registry.register(Gauge('adidas_navigation_cache_builds', 'Times the navigation links were built.',
+                            _if_repository(lambda: navigation.get_cache(repo.repo_instance).builds)))
+    registry.register(Gauge('adidas_featured_pool_products', 'Products in the featured products pool.',
+                            _if_repository(lambda: featured_products.get_pool().size)))
+    registry.register(Gauge('adidas_featured_pool_age_seconds', 'Age of the featured products pool.',
+                            _if_repository(lambda: featured_products.get_pool().age)))
+    # The coalescer is looked up when scraped, as single_flight.configure may replace it.
+    registry.register(Gauge('adidas_single_flight_in_flight', 'Coalesced calls currently running.',
+                            lambda: single_flight.coalescer.in_flight))
+    registry.register(Gauge('adidas_single_flight_shared_ratio', 'Share of calls served by a concurrent call.',
+                            lambda: single_flight.coalescer.shared_rate))
+
+    if repo.repo_instance is not None:
+        time_repository(repo.repo_instance, registry.repository_latency)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            endpoint = request.endpoint or 'unknown'
+            registry.request_latency.observe(time.perf_counter() - start, endpoint)
+            registry.requests.inc(endpoint, response.status_code)
+        return response
+
+    def metrics():
+        return Response(registry.exposition(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+
+def get_registry(app):
+    return app.extensions['metrics']
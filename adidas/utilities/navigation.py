@@ -0,0 +1,68 @@
+from threading import Lock
+
+from flask import url_for, request
+
+import adidas.adapters.repository as repo
+from adidas.adapters import indexes
+
+
+class NavigationCache:
+    # Navigation links, built once per catalog version (and application root) instead of running url_for for
+    # every product name and brand on each render.
+
+    def __init__(self):
+        self._key = None
+        self._navigation = None
+        self._lock = Lock()
+        self.hits = 0
+        self.builds = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.builds
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def get(self, repo, build):
+        key = (indexes.catalog_version(repo), request.script_root)
+        navigation = self._navigation
+        if self._key != key or navigation is None:
+            with self._lock:
+                if self._key != key or self._navigation is None:
+                    self._navigation = build(repo)
+                    self._key = key
+                    self.builds += 1
+                else:
+                    self.hits += 1
+                navigation = self._navigation
+        else:
+            self.hits += 1
+        return navigation
+
+
+def _build_navigation(repo):
+    names = sorted(set(product.name for brand in repo.get_brands() for product in brand.branded_products))
+    brands = [brand.brand_name for brand in repo.get_brands()]
+
+    name_urls = {name: url_for('home_bp.products_by_name', name=name) for name in names}
+    brand_urls = {brand: url_for('products_bp.products_by_brand', brand=brand) for brand in brands}
+
+    return {
+        'name_urls': name_urls,
+        'brand_urls': brand_urls
+    }
+
+
+def get_cache(repo_instance):
+    return indexes.get_index(repo_instance, 'navigation', lambda repo_instance: NavigationCache())
+
+
+def _navigation():
+    return get_cache(repo.repo_instance).get(repo.repo_instance, _build_navigation)
+
+
+def get_names_and_urls():
+    return _navigation()['name_urls']
+
+
+def get_brands_and_urls():
+    return _navigation()['brand_urls']
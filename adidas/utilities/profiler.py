@@ -0,0 +1,136 @@
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+
+class StackSampler:
+    # A sampling profiler for live requests. A background thread periodically takes the stack of every thread
+    # that is serving a profiled request and counts it per endpoint in folded form ("outer;inner;leaf"), which
+    # flame graph tools read directly. The same thread writes the files of endpoints with new samples every
+    # dump_interval seconds, and exits (after writing them) once no request is being profiled.
+
+    def __init__(self, output_path, interval=0.005, dump_interval=10.0):
+        self._output_path = output_path
+        self._interval = interval
+        self._dump_interval = dump_interval
+        self._active = dict()
+        self._stacks = dict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start_profiling(self, thread_id, endpoint):
+        with self._lock:
+            self._active[thread_id] = endpoint
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_while_active, name='stack-sampler', daemon=True)
+                self._thread.start()
+
+    def stop_profiling(self, thread_id):
+        # The endpoint's file is written later by the sampler thread, not on the request's thread.
+        with self._lock:
+            endpoint = self._active.pop(thread_id, None)
+            if endpoint is not None:
+                self._pending.add(endpoint)
+            return endpoint
+
+    def stacks(self, endpoint):
+        with self._lock:
+            return Counter(self._stacks.get(endpoint, Counter()))
+
+    def dump(self, endpoint):
+        # Rewrites the endpoint's file with all stacks aggregated so far. The file is written under a unique
+        # temporary name in the same directory and then renamed, so readers and concurrent dumps never see a
+        # partial file.
+        stacks = self.stacks(endpoint)
+        os.makedirs(self._output_path, exist_ok=True)
+        name = endpoint.replace('/', '_') + '.folded'
+        descriptor, temporary_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=self._output_path)
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                for stack, count in stacks.most_common():
+                    file.write('{} {}\n'.format(stack, count))
+            path = os.path.join(self._output_path, name)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        return path
+
+    def dump_pending(self):
+        with self._lock:
+            endpoints, self._pending = self._pending, set()
+        return [self.dump(endpoint) for endpoint in sorted(endpoints)]
+
+    def _sample_while_active(self):
+        dumped_at = time.monotonic()
+        while True:
+            time.sleep(self._interval)
+            self.sample()
+            if time.monotonic() - dumped_at >= self._dump_interval:
+                self.dump_pending()
+                dumped_at = time.monotonic()
+            with self._lock:
+                if len(self._active) == 0:
+                    self._thread = None
+                    break
+        self.dump_pending()
+
+    def sample(self):
+        with self._lock:
+            active = list(self._active.items())
+        if len(active) == 0:
+            return
+        frames = sys._current_frames()
+        samples = []
+        for thread_id, endpoint in active:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                samples.append((endpoint, _fold(frame)))
+        with self._lock:
+            for endpoint, stack in samples:
+                self._stacks.setdefault(endpoint, Counter())[stack] += 1
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def init_app(app):
+    # Profiling is off unless PROFILER_SAMPLE_RATE or PROFILER_TOKEN is set; when off no hooks are registered, so
+    # requests pay nothing for it.
+    sample_rate = float(app.config.get('PROFILER_SAMPLE_RATE') or 0)
+    token = app.config.get('PROFILER_TOKEN')
+    if sample_rate <= 0 and not token:
+        return
+
+    sampler = StackSampler(
+        app.config.get('PROFILER_OUTPUT_PATH') or os.path.join(app.instance_path, 'profiles'),
+        float(app.config.get('PROFILER_INTERVAL') or 0.005),
+        float(app.config.get('PROFILER_DUMP_INTERVAL') or 10.0)
+    )
+    app.extensions['profiler'] = sampler
+
+    @app.before_request
+    def start_profiling():
+        # A request is profiled when it carries the configured token in the X-Profile header, or at random.
+        requested = token is not None and request.headers.get('X-Profile') == token
+        if requested or random.random() < sample_rate:
+            sampler.start_profiling(threading.get_ident(), request.endpoint or 'unknown')
+            g.profiling = True
+
+    @app.teardown_request
+    def stop_profiling(exception=None):
+        if g.pop('profiling', False):
+            sampler.stop_profiling(threading.get_ident())
@@ -0,0 +1,141 @@
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify
+
+
+class Readiness:
+    # Tracks which population stages have completed. Stages run in order on a background thread, so the hot
+    # entities (e.g. the first page and the brand list) can be loaded before the rest of the catalog. Once a stage
+    # has failed, no later stage runs.
+
+    def __init__(self, stage_names=()):
+        self._stage_names = list(stage_names)
+        self._ready = set()
+        self._failed = None
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def mark_ready(self, stage_name):
+        with self._lock:
+            self._ready.add(stage_name)
+            self._changed.notify_all()
+
+    def mark_failed(self, stage_name, exception):
+        with self._lock:
+            self._failed = (stage_name, exception)
+            self._changed.notify_all()
+
+    def is_ready(self, stage_name=None):
+        # With no stage name, whether every stage has completed.
+        with self._lock:
+            return self._is_ready(stage_name)
+
+    def _is_ready(self, stage_name):
+        if stage_name is None:
+            return self._ready.issuperset(self._stage_names)
+        return stage_name in self._ready
+
+    def failure(self):
+        # The failed stage and its exception as a message, or None while no stage has failed.
+        with self._lock:
+            return None if self._failed is None else '{}: {}'.format(*self._failed)
+
+    def wait(self, stage_name=None, timeout=None):
+        # Blocks until the stage (or every stage) has completed, a stage has failed or timeout seconds have passed,
+        # and returns whether it completed.
+        with self._changed:
+            self._changed.wait_for(lambda: self._is_ready(stage_name) or self._failed is not None, timeout)
+            return self._is_ready(stage_name)
+
+    def status(self):
+        with self._lock:
+            return {
+                'ready': self._ready.issuperset(self._stage_names),
+                'stages': {stage_name: stage_name in self._ready for stage_name in self._stage_names},
+                'failed': None if self._failed is None else '{}: {}'.format(*self._failed),
+                'seconds_since_start': round(time.monotonic() - self._started_at, 3)
+            }
+
+
+def populate_in_background(app, stages):
+    # Runs stages, a list of (name, function) pairs, in order on a background thread and returns at once. Each
+    # function is called inside an application context.
+    readiness = Readiness([stage_name for stage_name, _ in stages])
+    app.extensions['readiness'] = readiness
+
+    def populate():
+        started_at = time.perf_counter()
+        with app.app_context():
+            for number, (stage_name, stage) in enumerate(stages, 1):
+                try:
+                    stage()
+                except Exception as exception:
+                    app.logger.exception('Population stage %s failed', stage_name)
+                    readiness.mark_failed(stage_name, exception)
+                    return
+                if number == len(stages):
+                    # Recorded before the last stage is marked ready, so it is there once the app is.
+                    _record_populate_duration(app, time.perf_counter() - started_at)
+                readiness.mark_ready(stage_name)
+
+    threading.Thread(target=populate, name='populate', daemon=True).start()
+    return readiness
+
+
+def _record_populate_duration(app, seconds):
+    registry = app.extensions.get('metrics')
+    if registry is not None:
+        registry.set_populate_duration(seconds)
+
+
+def get_readiness(app):
+    # Applications that populate synchronously have no Readiness, and are ready as soon as they serve requests.
+    return app.extensions.get('readiness')
+
+
+def requires_ready(stage_name=None, retry_after=2):
+    # Answers with a fast 503 until the given population stage (or, with no stage, all of them) has completed, and
+    # with a 500 if population failed before completing it.
+    def decorator(view):
+        @wraps(view)
+        def ready_view(*args, **kwargs):
+            readiness = get_readiness(current_app)
+            if readiness is not None and not readiness.is_ready(stage_name):
+                if readiness.failure() is not None:
+                    response = jsonify(error='The catalog could not be loaded.')
+                    response.status_code = 500
+                    return response
+                response = jsonify(error='The catalog is still loading, please retry shortly.')
+                response.status_code = 503
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+            return view(*args, **kwargs)
+
+        return ready_view
+
+    return decorator
+
+
+def init_app(app):
+    def healthz():
+        # Liveness: the process is up and serving requests, and has not failed to populate. A process whose
+        # population failed will never become ready, so it reports itself unhealthy to be restarted.
+        readiness = get_readiness(app)
+        failure = None if readiness is None else readiness.failure()
+        if failure is not None:
+            return jsonify(status='failed', failed=failure), 500
+        return jsonify(status='ok')
+
+    def readyz():
+        # Readiness: the catalog has been loaded.
+        readiness = get_readiness(app)
+        if readiness is None:
+            return jsonify(ready=True)
+        status = readiness.status()
+        return jsonify(status), 200 if status['ready'] else 503
+
+    app.add_url_rule('/healthz', 'healthz', healthz)
+    app.add_url_rule('/readyz', 'readyz', readyz)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # File locks are POSIX only; elsewhere calls are coalesced within each process only.
+    fcntl = None
+
+
+class SingleFlightTimeout(TimeoutError):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight:
+    # Coalesces concurrent calls with the same key: the first caller runs the function and the others wait for
+    # and share its result, or its exception. Nothing is cached once the call completes. Keys are scoped, e.g. to
+    # the repository the function reads, so that equal keys for different repositories are never coalesced.
+    #
+    # With a lock directory, calls are also coalesced across worker processes: the process holding the key's file
+    # lock computes the result and leaves it in a file as JSON, where processes that were waiting on the lock
+    # meanwhile pick it up. The last of them removes the key's files. Files are named after the key alone, so each
+    # database needs a lock directory of its own.
+
+    def __init__(self, lock_path=None):
+        self._calls = dict()
+        self._lock = threading.Lock()
+        # Calls made, and those that shared another caller's result within this process.
+        self.calls = 0
+        self.shared = 0
+        self._lock_path = lock_path if fcntl is not None else None
+        if self._lock_path is not None:
+            os.makedirs(self._lock_path, exist_ok=True)
+
+    def do(self, key, function, timeout=10.0, scope=None):
+        scoped_key = (id(scope), key)
+        with self._lock:
+            call = self._calls.get(scoped_key)
+            leader = call is None
+            if leader:
+                call = self._calls[scoped_key] = _Call()
+            self.calls += 1
+            self.shared += 0 if leader else 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise SingleFlightTimeout('Timed out waiting for {!r}'.format(key))
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            if self._lock_path is None:
+                call.result = function()
+            else:
+                call.result = self._do_across_processes(key, function, timeout)
+        except Exception as exception:
+            call.exception = exception
+            raise
+        finally:
+            with self._lock:
+                del self._calls[scoped_key]
+            call.done.set()
+        return call.result
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+    @property
+    def shared_rate(self):
+        return self.shared / self.calls if self.calls > 0 else 0.0
+
+    def _do_across_processes(self, key, function, timeout):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        result_path, lock_file_path, waiters_path = (os.path.join(self._lock_path, name + suffix)
+                                                     for suffix in ('.result', '.lock', '.waiters'))
+        waiting_since = time.time()
+        deadline = time.monotonic() + timeout
+
+        # Every caller holds a shared lock on the key's .waiters file until it has its result. The caller that
+        # leaves last removes the key's files, the .waiters file last, so a new set is only created once the old
+        # one is gone.
+        waiters = self._open_locked(waiters_path, fcntl.LOCK_SH, deadline, key)
+        try:
+            lock_file = self._open_locked(lock_file_path, fcntl.LOCK_EX, deadline, key)
+            try:
+                # Only a result written while we waited for the lock came from a call that overlapped ours; an
+                # older one may predate writes this caller has made or seen.
+                written = self._read_result(result_path)
+                if written is not None and written[0] >= waiting_since:
+                    return written[1]
+                result = function()
+                self._write_result(result_path, result)
+                return result
+            finally:
+                lock_file.close()
+        finally:
+            self._leave(waiters, (result_path, lock_file_path, waiters_path))
+
+    def _open_locked(self, path, operation, deadline, key):
+        # Opens path and flocks it. A file removed by its last user while we waited is opened afresh.
+        while True:
+            lock_file = open(path, 'a')
+            try:
+                fcntl.flock(lock_file, operation | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if not _wait_for_lock(lock_file, operation, deadline):
+                    raise SingleFlightTimeout('Timed out waiting for {!r}'.format(key))
+            try:
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino:
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    def _leave(self, waiters, paths):
+        # Removes the key's files if no other caller holds the .waiters file.
+        try:
+            fcntl.flock(waiters, fcntl.LOCK_UN)
+            fcntl.flock(waiters, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            waiters.close()
+            return
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        waiters.close()
+
+    def _read_result(self, result_path):
+        # Returns (time written, result), or None if there is no readable result.
+        try:
+            with open(result_path, 'r') as result_file:
+                return json.load(result_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, result_path, result):
+        # Results are shared as JSON, so tuples reach the other processes as lists. A result that is not JSON
+        # serialisable is not shared; callers waiting for it compute their own.
+        try:
+            written = json.dumps([time.time(), result])
+            descriptor, temporary_path = tempfile.mkstemp(dir=self._lock_path)
+            with os.fdopen(descriptor, 'w') as result_file:
+                result_file.write(written)
+            os.replace(temporary_path, result_path)
+        except (OSError, TypeError, ValueError):
+            pass
+
+
+def _wait_for_lock(lock_file, operation, deadline):
+    # flock cannot time out, so a helper thread blocks on it while we wait for up to the deadline. Returns False if
+    # the deadline passed first; the helper then closes the file, releasing the lock, as soon as it gets it.
+    acquired = threading.Event()
+    guard = threading.Lock()
+    abandoned = []
+
+    def block():
+        fcntl.flock(lock_file, operation)
+        with guard:
+            if abandoned:
+                lock_file.close()
+            else:
+                acquired.set()
+
+    threading.Thread(target=block, daemon=True).start()
+    acquired.wait(max(deadline - time.monotonic(), 0))
+    with guard:
+        if not acquired.is_set():
+            abandoned.append(True)
+        return acquired.is_set()
+
+
+# The coalescer used by the services. configure() replaces it, e.g. to coalesce across worker processes.
+coalescer = SingleFlight()
+
+
+def configure(lock_path=None):
+    global coalescer
+    coalescer = SingleFlight(lock_path)
+
+
+def coalesce(key, function, timeout=10.0, scope=None):
+    return coalescer.do(key, function, timeout, scope)
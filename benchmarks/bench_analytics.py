@@ -0,0 +1,115 @@
+"""Times the per-brand analytics computed by walking the object graph against the NumPy columns.
+
+The memory repository is seeded with synthetic catalogs generated from the tests/data sample feed at multiples of
+its size. Both implementations are checked to agree before they are timed. Besides a plain query, the path the
+analytics see in production is timed: a comment is added, then the analytics are queried through the home
+services, which count the comment into the columns rather than rebuilding them.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analytics [--scales 1 10] [--repetitions N]
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+from adidas.adapters import memory_repository
+from adidas.adapters.catalog_analytics import build_catalog_analytics
+from adidas.adapters.memory_repository import MemoryRepository
+from adidas.domain.model import make_comment
+from adidas.home import services
+from benchmarks.bench_repository import DATA_PATHS, Sample, scale_data
+
+
+def naive_brand_summaries(repo):
+    # The loop the analytics columns replace: every brand's products visited one by one.
+    summaries = []
+    for brand in sorted(repo.get_brands(), key=lambda brand: brand.brand_name):
+        products = brand.branded_products
+        prices = sorted(product.price for product in products if product.price is not None)
+        discounts = sorted(0 if product.discount is None else product.discount for product in products)
+        number_of_comments = sum(product.number_of_comments for product in products)
+        summaries.append({
+            'brand': brand.brand_name,
+            'number_of_products': brand.number_of_branded_products,
+            'number_of_comments': number_of_comments,
+            'comments_per_product': number_of_comments / brand.number_of_branded_products,
+            'price': describe(prices),
+            'discount': describe(discounts),
+            'number_discounted': sum(1 for discount in discounts if discount > 0)
+        })
+    return summaries
+
+
+def describe(values):
+    if not values:
+        return None
+    quartiles = statistics.quantiles(values, n=4, method='inclusive') if len(values) > 1 else [values[0]] * 3
+    return {'min': values[0], 'max': values[-1], 'mean': statistics.mean(values), 'quartiles': quartiles}
+
+
+def check_agreement(naive, vectorised):
+    for expected, actual in zip(naive, vectorised):
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                for statistic in ('min', 'max', 'mean'):
+                    assert abs(value[statistic] - actual[key][statistic]) < 1e-6, (expected['brand'], key, statistic)
+                for quartile, other in zip(value['quartiles'], actual[key]['quartiles']):
+                    assert abs(quartile - other) < 1e-6, (expected['brand'], key, 'quartiles')
+            elif isinstance(value, float):
+                assert abs(value - actual[key]) < 1e-6, (expected['brand'], key)
+            else:
+                assert value == actual[key], (expected['brand'], key)
+    assert len(naive) == len(vectorised)
+
+
+def time_calls(function, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10])
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        work_path = tempfile.mkdtemp(prefix='adidas-bench-')
+        try:
+            scale_data(DATA_PATHS['memory'], work_path, scale)
+            repo = MemoryRepository()
+            memory_repository.populate(work_path, repo)
+
+            analytics = build_catalog_analytics(repo)
+            check_agreement(naive_brand_summaries(repo), analytics.brand_summaries())
+
+            naive = time_calls(lambda: naive_brand_summaries(repo), args.repetitions)
+            build = time_calls(lambda: build_catalog_analytics(repo), args.repetitions)
+            query = time_calls(analytics.brand_summaries, args.repetitions)
+            print('{:>4}x  object graph {:8.2f} ms   columns: build {:8.2f} ms, query {:8.2f} ms ({:.0f}x faster)'
+                  .format(scale, naive * 1000, build * 1000, query * 1000, naive / query))
+
+            sample = Sample(repo)
+
+            def comment_then_query():
+                repo.add_comment(make_comment('Benchmark comment', sample.user, sample.choice(sample.products)))
+                return services.get_brand_analytics(repo)
+
+            # The first query builds the columns; the second counts its comment into them.
+            comment_then_query()
+            summaries = comment_then_query()
+            check_agreement(naive_brand_summaries(repo), summaries)
+            commented = time_calls(comment_then_query, args.repetitions)
+            print('       comment then query {:8.2f} ms ({:.0f}x faster than rebuilding)'
+                  .format(commented * 1000, build / commented))
+        finally:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Times GET / end to end with the navigation links built on every render and with them cached.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_home_page [--requests N]
+"""
+import argparse
+import os
+import time
+
+from adidas import create_app
+import adidas.adapters.repository as repo
+import adidas.utilities.utilities as utilities
+import adidas.utilities.navigation as navigation
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'data', 'memory')
+
+
+def time_calls(function, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions
+
+
+def time_home_page(client, repetitions, cached_navigation):
+    # Renders GET / end to end, with the home view's navigation helpers swapped for the uncached ones when
+    # cached_navigation is False.
+    names_and_urls, brands_and_urls = navigation.get_names_and_urls, navigation.get_brands_and_urls
+    if not cached_navigation:
+        navigation.get_names_and_urls, navigation.get_brands_and_urls = \
+            utilities.get_names_and_urls, utilities.get_brands_and_urls
+    try:
+        client.get('/')
+        return time_calls(lambda: client.get('/'), repetitions)
+    finally:
+        navigation.get_names_and_urls, navigation.get_brands_and_urls = names_and_urls, brands_and_urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'TEST_DATA_PATH': DATA_PATH,
+        'WTF_CSRF_ENABLED': False
+    })
+    client = app.test_client()
+
+    before = time_home_page(client, args.requests, cached_navigation=False)
+    after = time_home_page(client, args.requests, cached_navigation=True)
+
+    print('products:                       {}'.format(repo.repo_instance.get_number_of_products()))
+    print('GET / with uncached navigation: {:.3f} ms'.format(before * 1000))
+    print('GET / with cached navigation:   {:.3f} ms'.format(after * 1000))
+
+
+if __name__ == '__main__':
+    main()
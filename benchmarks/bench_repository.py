@@ -0,0 +1,180 @@
+"""Benchmarks every AbstractRepository read/write path against MemoryRepository and SqlAlchemyRepository.
+
+The repositories are seeded with synthetic catalogs generated from the tests/data sample feed at multiples of its
+size. Results are printed as a table and can be written as JSON; given a baseline JSON file the run fails
+when any operation has slowed down by more than the threshold.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_repository --scales 1 10 --output results.json
+    python -m benchmarks.bench_repository --baseline results.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from adidas.adapters import memory_repository, database_repository, synthetic_data
+from adidas.adapters.database_repository import SqlAlchemyRepository
+from adidas.adapters.memory_repository import MemoryRepository
+from adidas.adapters.orm import metadata, map_model_to_tables
+from adidas.domain.model import make_comment
+import adidas.products.services as services
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PRODUCTS = 2625
+DATA_PATHS = {
+    'memory': os.path.join(ROOT, 'tests', 'data', 'memory'),
+    'database': os.path.join(ROOT, 'tests', 'data', 'database')
+}
+
+
+def scale_data(source_path, target_path, scale):
+    # Generates a catalog scale times the size of the sample feed, with users and comments in proportion.
+    synthetic_data.generate(target_path, products=SAMPLE_PRODUCTS * scale, users=100 * scale,
+                            comments=1000 * scale, sample_path=source_path)
+
+
+def build_memory_repository(data_path, work_path):
+    repo = MemoryRepository()
+    memory_repository.populate(data_path, repo)
+    return repo
+
+
+def build_database_repository(data_path, work_path):
+    clear_mappers()
+    engine = create_engine('sqlite:///' + os.path.join(work_path, 'adidas-bench.db'))
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    map_model_to_tables()
+    database_repository.populate(engine, data_path)
+    return SqlAlchemyRepository(sessionmaker(bind=engine, autocommit=False, autoflush=True))
+
+
+BUILDERS = {
+    'memory': build_memory_repository,
+    'database': build_database_repository
+}
+
+
+class Sample:
+    # Inputs for the benchmarked calls, drawn once per repository so that both adapters see the same workload.
+
+    def __init__(self, repo, seed=0):
+        rng = random.Random(seed)
+        products = [product for brand in repo.get_brands() for product in brand.branded_products]
+        self.products = rng.sample(products, min(100, len(products)))
+        self.product_ids = [product.id for product in self.products]
+        self.brand_names = [brand.brand_name for brand in repo.get_brands()]
+        self.prices = [product.price for product in self.products]
+        self.names = [product.name.split()[-1] for product in self.products]
+        self.user = repo.get_user('user1')
+        self._rng = rng
+
+    def choice(self, values):
+        return self._rng.choice(values)
+
+
+CASES = {
+    'get_product': lambda repo, sample: repo.get_product(sample.choice(sample.product_ids)),
+    'get_product_missing': lambda repo, sample: repo.get_product('B4'),
+    'get_products_by_id': lambda repo, sample: repo.get_products_by_id(sample.product_ids[:10]),
+    'get_product_ids_for_brand': lambda repo, sample: repo.get_product_ids_for_brand(
+        sample.choice(sample.brand_names)),
+    'get_products_by_price': lambda repo, sample: repo.get_products_by_price(sample.choice(sample.prices)),
+    'get_number_of_products': lambda repo, sample: repo.get_number_of_products(),
+    'get_product_ids_by_name': lambda repo, sample: services.get_product_ids_by_name(
+        sample.choice(sample.names), repo),
+    'add_comment': lambda repo, sample: repo.add_comment(
+        make_comment('Benchmark comment', sample.user, sample.choice(sample.products))),
+}
+
+
+def time_case(case, repo, sample, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        case(repo, sample)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'mean_us': statistics.mean(timings) * 1e6,
+        'p50_us': timings[len(timings) // 2] * 1e6,
+        'p95_us': timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1e6
+    }
+
+
+def run(adapters, scales, cases, iterations):
+    results = []
+    for adapter in adapters:
+        for scale in scales:
+            work_path = tempfile.mkdtemp(prefix='adidas-bench-')
+            try:
+                scale_data(DATA_PATHS[adapter], work_path, scale)
+                start = time.perf_counter()
+                repo = BUILDERS[adapter](work_path, work_path)
+                populate_seconds = time.perf_counter() - start
+                sample = Sample(repo)
+                for case_name in cases:
+                    result = time_case(CASES[case_name], repo, sample, iterations)
+                    result.update(adapter=adapter, scale=scale, case=case_name, populate_s=populate_seconds)
+                    results.append(result)
+                    print('{adapter:<9} {scale:>4}x {case:<28} mean {mean_us:>10.1f} us  '
+                          'p95 {p95_us:>10.1f} us'.format(**result), file=sys.stderr)
+            finally:
+                shutil.rmtree(work_path, ignore_errors=True)
+    return results
+
+
+def regressions(results, baseline, threshold):
+    # Returns the results whose mean is more than threshold (a fraction) slower than the baseline's.
+    baseline_means = {(result['adapter'], result['scale'], result['case']): result['mean_us'] for result in baseline}
+    slower = []
+    for result in results:
+        key = (result['adapter'], result['scale'], result['case'])
+        if key in baseline_means and result['mean_us'] > baseline_means[key] * (1 + threshold):
+            slower.append((result, baseline_means[key]))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--adapters', nargs='+', choices=sorted(BUILDERS), default=sorted(BUILDERS))
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10, 100])
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='fractional slowdown against the baseline that counts as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.adapters, args.scales, args.cases, args.iterations)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            slower = regressions(results, json.load(baseline_file), args.threshold)
+        for result, baseline_mean in slower:
+            print('REGRESSION {adapter} {scale}x {case}: {mean_us:.1f} us'.format(**result),
+                  '(baseline {:.1f} us)'.format(baseline_mean), file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Mixed reader/writer benchmark for the SQLite configuration of the database repository.
+
+Reader threads look up products and their comments while writer threads add comments, first against a plain
+engine in the default rollback-journal mode and then against the WAL-configured writer/read-pool engines.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sqlite_concurrency --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from adidas.adapters.sqlite_engines import make_session_factory
+
+SCHEMA = [
+    'CREATE TABLE products (id TEXT PRIMARY KEY, name TEXT, price INTEGER)',
+    'CREATE TABLE comments (id INTEGER PRIMARY KEY, product_id TEXT, comment TEXT, timestamp TEXT)',
+    'CREATE INDEX comments_product_id ON comments (product_id)'
+]
+
+
+def create_database(path, products):
+    engine = create_engine('sqlite:///' + path)
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute('INSERT INTO products (id, name, price) VALUES (?, ?, ?)',
+                           [('P{}'.format(index), 'Product {}'.format(index), index % 500) for index in range(products)])
+    engine.dispose()
+
+
+def run_workload(session_factory, readers, writers, seconds, products):
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def work(kind, seed):
+        rng = random.Random(seed)
+        own_latencies = []
+        own_errors = 0
+        while time.perf_counter() < deadline:
+            product_id = 'P{}'.format(rng.randrange(products))
+            session = session_factory()
+            start = time.perf_counter()
+            try:
+                if kind == 'read':
+                    session.execute('SELECT name, price FROM products WHERE id = :id', {'id': product_id}).fetchall()
+                    session.execute('SELECT comment FROM comments WHERE product_id = :id', {'id': product_id}).fetchall()
+                    session.commit()
+                else:
+                    session.execute("INSERT INTO comments (product_id, comment, timestamp) "
+                                    "VALUES (:id, 'Benchmark comment', datetime('now'))", {'id': product_id})
+                    session.commit()
+                own_latencies.append(time.perf_counter() - start)
+            except Exception:
+                session.rollback()
+                own_errors += 1
+            finally:
+                session.close()
+        with lock:
+            latencies[kind].extend(own_latencies)
+            errors[kind] += own_errors
+
+    threads = [threading.Thread(target=work, args=('read', seed)) for seed in range(readers)]
+    threads += [threading.Thread(target=work, args=('write', readers + seed)) for seed in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def summarise(name, latencies, errors, seconds):
+    for kind in ('read', 'write'):
+        values = sorted(latencies[kind])
+        if len(values) == 0:
+            print('{:<8} {:<5} no completed operations, {} errors'.format(name, kind, errors[kind]))
+            continue
+        print('{:<8} {:<5} {:>9.0f} ops/s  p50 {:>8.3f} ms  p99 {:>8.3f} ms  errors {}'.format(
+            name, kind, len(values) / seconds, values[len(values) // 2] * 1000,
+            values[min(len(values) - 1, int(len(values) * 0.99))] * 1000, errors[kind]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--products', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    work_path = tempfile.mkdtemp(prefix='adidas-sqlite-')
+    try:
+        default_path = os.path.join(work_path, 'default.db')
+        create_database(default_path, args.products)
+        default_engine = create_engine('sqlite:///' + default_path, connect_args={'check_same_thread': False})
+        latencies, errors = run_workload(sessionmaker(bind=default_engine), args.readers, args.writers,
+                                         args.seconds, args.products)
+        summarise('default', latencies, errors, args.seconds)
+
+        tuned_path = os.path.join(work_path, 'tuned.db')
+        create_database(tuned_path, args.products)
+        session_factory = make_session_factory('sqlite:///' + tuned_path, read_pool_size=args.readers)
+        latencies, errors = run_workload(session_factory, args.readers, args.writers, args.seconds, args.products)
+        summarise('wal', latencies, errors, args.seconds)
+    finally:
+        shutil.rmtree(work_path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
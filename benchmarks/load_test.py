@@ -0,0 +1,213 @@
+"""Load-test harness driving realistic user flows through the Flask application.
+
+Each virtual user runs the flow home -> search -> page through results -> view comments -> register/login ->
+add to collection -> comment, pausing for a random think time between steps. Requests go straight through the
+WSGI interface of create_app() or, with --url, to a running server. Latency percentiles are reported per route.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --repository memory --users 8 --iterations 20
+    python -m benchmarks.load_test --repository database --users 8 --think-time 0.05
+    python -m benchmarks.load_test --url http://localhost:5000 --users 16
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import build_opener, HTTPCookieProcessor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_TERMS = ['Shoes', 'Originals', 'Running', 'Slippers', 'Superstar', 'Tee']
+
+
+class WsgiClient:
+    # Sends requests through the application's WSGI interface, keeping a cookie jar per virtual user.
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def get(self, path):
+        return self._client.get(path).status_code
+
+    def post(self, path, data):
+        return self._client.post(path, data=data).status_code
+
+
+class HttpClient:
+    # Sends requests to a running server.
+
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip('/')
+        self._opener = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def get(self, path):
+        return self._open(path, None)
+
+    def post(self, path, data):
+        return self._open(path, urlencode(data).encode('utf-8'))
+
+    def _open(self, path, body):
+        try:
+            with self._opener.open(self._base_url + path, body) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+
+
+class Recorder:
+    def __init__(self):
+        self._latencies = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self._latencies[route].append(seconds)
+            if status >= 400:
+                self._errors[route] += 1
+
+    def report(self, elapsed):
+        report = {}
+        for route, latencies in sorted(self._latencies.items()):
+            latencies = sorted(latencies)
+            report[route] = {
+                'requests': len(latencies),
+                'errors': self._errors[route],
+                'requests_per_second': len(latencies) / elapsed,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000
+            }
+        return report
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class VirtualUser:
+    def __init__(self, number, client, recorder, think_time, rng):
+        self._number = number
+        self._client = client
+        self._recorder = recorder
+        self._think_time = think_time
+        self._rng = rng
+
+    def _request(self, route, method, path, data=None):
+        start = time.perf_counter()
+        if method == 'GET':
+            status = self._client.get(path)
+        else:
+            status = self._client.post(path, data)
+        self._recorder.record(route, time.perf_counter() - start, status)
+        if self._think_time > 0:
+            time.sleep(self._rng.uniform(0, self._think_time))
+
+    def run_flow(self, iteration, product_ids):
+        term = self._rng.choice(SEARCH_TERMS)
+        product_id = self._rng.choice(product_ids)
+        username = 'load{}x{}'.format(self._number, iteration)
+        password = 'LoadTest{}'.format(iteration)
+
+        self._request('home', 'GET', '/')
+        self._request('search', 'POST', '/', {'name': term})
+        for cursor in (3, 6):
+            self._request('search_page', 'POST', '/?cursor={}'.format(cursor), {'name': term})
+        self._request('view_comments', 'POST', '/?view_comments_for={}'.format(product_id), {'name': term})
+        self._request('register', 'POST', '/authentication/register', {'username': username, 'password': password})
+        self._request('login', 'POST', '/authentication/login', {'username': username, 'password': password})
+        self._request('add_to_collection', 'GET', '/collection/added?product={}'.format(product_id))
+        self._request('comment', 'POST', '/comment', {'comment': 'Great value for the price', 'product_id': product_id})
+        self._request('logout', 'GET', '/authentication/logout')
+
+
+def create_local_app(repository, data_path):
+    from adidas import create_app
+
+    config = {
+        'TESTING': True,
+        'REPOSITORY': repository,
+        'TEST_DATA_PATH': data_path,
+        'WTF_CSRF_ENABLED': False
+    }
+    if repository == 'database':
+        config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'adidas-load.db')
+        config['SQLALCHEMY_ECHO'] = False
+    return create_app(config)
+
+
+def sample_product_ids(data_path, count=50):
+    with open(os.path.join(data_path, 'adidas.csv'), newline='', encoding='utf-8-sig') as file:
+        product_ids = [row['Product ID'] for row in csv.DictReader(file)]
+    return random.Random(0).sample(product_ids, min(count, len(product_ids)))
+
+
+def run(make_client, product_ids, users, iterations, think_time, seed):
+    recorder = Recorder()
+
+    def worker(number):
+        user = VirtualUser(number, make_client(), recorder, think_time, random.Random(seed + number))
+        for iteration in range(iterations):
+            user.run_flow(iteration, product_ids)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return recorder.report(elapsed), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repository', choices=['memory', 'database'], default='memory')
+    parser.add_argument('--data-path', help='data to load (defaults to tests/data/<repository>)')
+    parser.add_argument('--url', help='load test a running server instead of the in-process WSGI application')
+    parser.add_argument('--users', type=int, default=4, help='number of concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=10, help='flows run by each virtual user')
+    parser.add_argument('--think-time', type=float, default=0.0, help='maximum pause in seconds between steps')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    data_path = args.data_path or os.path.join(ROOT, 'tests', 'data', args.repository)
+    product_ids = sample_product_ids(data_path)
+
+    if args.url:
+        def make_client():
+            return HttpClient(args.url)
+    else:
+        app = create_local_app(args.repository, data_path)
+
+        def make_client():
+            return WsgiClient(app)
+
+    report, elapsed = run(make_client, product_ids, args.users, args.iterations, args.think_time, args.seed)
+
+    if args.json:
+        json.dump({'repository': args.repository, 'elapsed_s': elapsed, 'routes': report}, sys.stdout, indent=2)
+        return
+
+    print('repository={} users={} elapsed={:.2f}s'.format(args.repository, args.users, elapsed))
+    print('{:<18} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9}'.format(
+        'route', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for route, stats in report.items():
+        print('{:<18} {requests:>8} {errors:>7} {requests_per_second:>9.1f} {p50_ms:>9.2f} {p95_ms:>9.2f} '
+              '{p99_ms:>9.2f}'.format(route, **stats))
+
+
+if __name__ == '__main__':
+    main()
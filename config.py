@@ -19,5 +19,34 @@ class Config:
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
     SQLALCHEMY_ECHO = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Size of the pool of read-only SQLite connections used alongside the single writer connection.
+    SQLITE_READ_POOL_SIZE = int(environ.get('SQLITE_READ_POOL_SIZE', 4))
 
     REPOSITORY = environ.get('REPOSITORY')
+
+    # Build the derived indexes on a background thread at start-up; routes answer 503 until they are ready.
+    POPULATE_IN_BACKGROUND = environ.get('POPULATE_IN_BACKGROUND', 'False') == 'True'
+
+    # Group commit of comment and collection writes in the database repository.
+    WRITE_BEHIND_ENABLED = environ.get('WRITE_BEHIND_ENABLED', 'False') == 'True'
+    WRITE_BEHIND_FLUSH_INTERVAL = float(environ.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.005))
+
+    # False-positive rate of the Bloom filter that answers lookups of unknown product ids.
+    PRODUCT_FILTER_FALSE_POSITIVE_RATE = float(environ.get('PRODUCT_FILTER_FALSE_POSITIVE_RATE', 0.01))
+
+    # Directory for the file locks that coalesce identical searches across worker processes (unset: per process).
+    # Use one directory per database.
+    SINGLE_FLIGHT_PATH = environ.get('SINGLE_FLIGHT_PATH')
+
+    # Featured products configuration
+    FEATURED_PRODUCTS_POOL_SIZE = int(environ.get('FEATURED_PRODUCTS_POOL_SIZE', 30))
+    FEATURED_PRODUCTS_REFRESH_INTERVAL = int(environ.get('FEATURED_PRODUCTS_REFRESH_INTERVAL', 60))
+    FEATURED_PRODUCTS_ROTATION_INTERVAL = int(environ.get('FEATURED_PRODUCTS_ROTATION_INTERVAL', 10))
+
+    # Profiling configuration: a fraction of requests, and requests sending PROFILER_TOKEN in the X-Profile
+    # header, are profiled. Both unset disables profiling.
+    PROFILER_SAMPLE_RATE = float(environ.get('PROFILER_SAMPLE_RATE', 0))
+    PROFILER_TOKEN = environ.get('PROFILER_TOKEN')
+    PROFILER_OUTPUT_PATH = environ.get('PROFILER_OUTPUT_PATH')
+    # Seconds between writes of the profiled endpoints' stack files.
+    PROFILER_DUMP_INTERVAL = float(environ.get('PROFILER_DUMP_INTERVAL', 10))
@@ -88,6 +88,16 @@ def client():
 
     return my_app.test_client()
 
+@pytest.fixture
+def populating_app():
+    return create_app({
+        'TESTING': True,
+        'REPOSITORY': 'memory',
+        'TEST_DATA_PATH': TEST_DATA_PATH_MEMORY,
+        'WTF_CSRF_ENABLED': False,
+        'POPULATE_IN_BACKGROUND': True                  # Build the derived indexes on a background thread.
+    })
+
 
 class AuthenticationManager:
     def __init__(self, client):
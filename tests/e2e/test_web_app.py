@@ -2,6 +2,9 @@ import pytest
 
 from flask import session
 
+from adidas.utilities.fragment_cache import get_fragment_cache
+from adidas.utilities.readiness import get_readiness
+
 
 def test_register(client):
     # Check that we retrieve the register page.
@@ -107,3 +110,105 @@ def test_products_with_brand(client):
     # Check that all products branded 'ORIGINALS' are included on the page.
     assert b'Product branded by ORIGINALS' in response.data
     assert b"Women&#39;s adidas Originals NMD_Racer Primeknit Shoes" in response.data
+
+
+def test_index_revalidates_with_etag(client):
+    response = client.get('/')
+    etag = response.headers['ETag']
+    assert 'Cookie' in response.headers['Vary']
+
+    # Check that revalidating an unchanged page returns 304 without a body.
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_index_etag_changes_when_comment_posted(client, auth):
+    auth.login()
+    etag = client.get('/').headers['ETag']
+
+    client.post('/comment', data={'comment': 'Just bought a pair!', 'product_id': 'AH2430'})
+
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_index_etag_differs_for_logged_in_user(client, auth):
+    anonymous_etag = client.get('/').headers['ETag']
+
+    auth.login()
+    response = client.get('/', headers={'If-None-Match': anonymous_etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous_etag
+    assert 'private' in response.headers['Cache-Control']
+
+
+def test_products_by_name_with_unknown_sort_key(client):
+    response = client.post('/?sort=name', data={'name': 'NMD_R1 Shoes'})
+    assert response.status_code == 400
+
+
+def test_product_cards_are_cached_across_listings(client):
+    client.post('/', data={'name': 'NMD_R1 Shoes'})
+    fragment_cache = get_fragment_cache(client.application)
+    misses = fragment_cache.misses
+
+    # Check that the same page for the same viewer is assembled from cached cards.
+    response = client.post('/', data={'name': 'NMD_R1 Shoes'})
+    assert response.status_code == 200
+    assert fragment_cache.misses == misses
+    assert fragment_cache.hits > 0
+
+
+def test_add_unknown_product_to_collection(client, auth):
+    auth.login()
+
+    response = client.get('/collection/added?product=B4')
+    assert response.status_code == 404
+
+
+def test_metrics_endpoint(client):
+    client.get('/')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'adidas_request_duration_seconds_count{endpoint="home_bp.home"}' in response.data
+
+
+def test_health_and_readiness_checks(client):
+    assert client.get('/healthz').status_code == 200
+    assert client.get('/readyz').status_code == 200
+
+
+def test_indexes_populated_in_background(populating_app):
+    client = populating_app.test_client()
+
+    assert get_readiness(populating_app).wait(timeout=30)
+    assert client.get('/readyz').get_json()['stages'] == {'home': True, 'catalog': True, 'recommendations': True}
+    assert client.get('/').status_code == 200
+
+
+def test_suggest(client):
+    response = client.get('/suggest?q=origin')
+    assert response.status_code == 200
+
+    suggestions = response.get_json()['suggestions']
+    assert suggestions[0]['text'] == 'ORIGINALS'
+    assert suggestions[0]['url'] == '/products_by_brand?brand=ORIGINALS'
+
+
+def test_similar_products(client):
+    response = client.get('/similar_products?product=AH2430')
+    assert response.status_code == 200
+    assert response.get_json()['product'] == 'AH2430'
+
+    assert client.get('/similar_products?product=UNKNOWN').status_code == 404
+
+
+def test_brand_analytics(client):
+    response = client.get('/analytics/brands')
+    assert response.status_code == 200
+
+    brands = response.get_json()['brands']
+    assert 'ORIGINALS' in [brand['brand'] for brand in brands]
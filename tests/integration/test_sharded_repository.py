@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from adidas.adapters.database_repository import SqlAlchemyRepository
+from adidas.adapters.orm import metadata
+from adidas.adapters.sharded_repository import ShardedRepository, copy_catalog, shard_index
+from adidas.domain.model import make_comment
+
+
+@pytest.fixture
+def shard_engines(tmp_path):
+    # File-backed, so that every fan-out thread sees the same data.
+    engines = [create_engine('sqlite:///' + str(tmp_path / 'shard-{}.db'.format(index))) for index in range(3)]
+    for engine in engines:
+        metadata.create_all(engine)
+    yield engines
+    for engine in engines:
+        metadata.drop_all(engine)
+
+
+@pytest.fixture
+def sharded_database_repo(session_factory, shard_engines):
+    repo = ShardedRepository([SqlAlchemyRepository(sessionmaker(bind=engine)) for engine in shard_engines])
+    copy_catalog(SqlAlchemyRepository(session_factory), repo, usernames=['tobin', 'irem', 'archie'])
+    yield repo
+    repo.close()
+
+
+def test_cross_shard_reads_match_single_repository(sharded_database_repo, session_factory):
+    source = SqlAlchemyRepository(session_factory)
+
+    assert sharded_database_repo.get_number_of_products() == source.get_number_of_products()
+    assert sorted(sharded_database_repo.get_product_ids_for_brand('ORIGINALS')) == \
+           sorted(source.get_product_ids_for_brand('ORIGINALS'))
+    assert sum(len(list(brand.branded_products)) for brand in sharded_database_repo.get_brands()) == \
+           source.get_number_of_products()
+    assert len(sharded_database_repo.get_comments()) == 3
+
+
+def test_products_by_id_leave_out_unknown_ids(sharded_database_repo):
+    products = sharded_database_repo.get_products_by_id(['G27341', 'B4', 'AH2430'])
+
+    assert [product.id for product in products] == ['G27341', 'AH2430']
+
+
+def test_comment_is_committed_to_its_products_shard(sharded_database_repo, shard_engines):
+    user = sharded_database_repo.get_user_for_product('tobin', 'B44832')
+    product = sharded_database_repo.get_product('B44832')
+
+    sharded_database_repo.add_comment(make_comment('Great fit for running', user, product))
+
+    # Check the row through a connection of another engine, so it must have been committed to the shard's file.
+    shard_engine = create_engine(shard_engines[shard_index('B44832', len(shard_engines))].url)
+    rows = list(shard_engine.execute('SELECT comment FROM comments WHERE product_id = :product_id',
+                                     {'product_id': 'B44832'}))
+    assert rows == [('Great fit for running',)]
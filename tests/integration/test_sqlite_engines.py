@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from adidas.adapters.sqlite_engines import create_engines, make_session_factory
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    return 'sqlite:///' + str(tmp_path / 'adidas-wal.db')
+
+
+def test_connections_use_wal_and_tuned_pragmas(database_uri):
+    write_engine, read_engine = create_engines(database_uri)
+
+    with write_engine.connect() as connection:
+        assert connection.execute('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.execute('PRAGMA synchronous').scalar() == 1
+
+    # Check that connections from the read pool cannot write.
+    with read_engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute('CREATE TABLE products (id TEXT)')
+
+
+def test_session_routes_writes_to_writer_and_reads_to_readers(database_uri):
+    session_factory = make_session_factory(database_uri)
+    statements = {'write': [], 'read': []}
+    for name in statements:
+        event.listen(session_factory.kw[name + '_engine'], 'before_cursor_execute',
+                     lambda connection, cursor, statement, *args, name=name: statements[name].append(statement))
+    session = session_factory()
+
+    session.execute('CREATE TABLE comments (id INTEGER PRIMARY KEY, comment TEXT)')
+    session.commit()
+    session.execute("INSERT INTO comments (comment) VALUES ('Best product!')")
+    # Check that a read before the commit goes to the writer, which holds the uncommitted insert.
+    assert session.execute('SELECT comment FROM comments').scalar() == 'Best product!'
+    session.commit()
+    assert session.execute('SELECT COUNT(*) FROM comments').scalar() == 1
+    session.close()
+
+    assert statements['write'] == ['CREATE TABLE comments (id INTEGER PRIMARY KEY, comment TEXT)',
+                                   "INSERT INTO comments (comment) VALUES ('Best product!')",
+                                   'SELECT comment FROM comments']
+    assert statements['read'] == ['SELECT COUNT(*) FROM comments']
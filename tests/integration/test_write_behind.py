@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from adidas.adapters.database_repository import SqlAlchemyRepository
+from adidas.adapters.write_behind import GroupCommitWriter, write_comments_behind
+from adidas.domain.model import make_comment
+
+
+@pytest.fixture
+def writer_session_factory(tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'write-behind.db'))
+    engine.execute('CREATE TABLE comments (id INTEGER PRIMARY KEY, comment TEXT NOT NULL)')
+    return sessionmaker(bind=engine)
+
+
+def insert_comment(comment_id, text):
+    return lambda session: session.execute('INSERT INTO comments (id, comment) VALUES (:id, :comment)',
+                                           {'id': comment_id, 'comment': text})
+
+
+def count_comments(session_factory):
+    session = session_factory()
+    try:
+        return session.execute('SELECT COUNT(*) FROM comments').scalar()
+    finally:
+        session.close()
+
+
+def test_writes_from_many_threads_are_committed(writer_session_factory):
+    writer = GroupCommitWriter(writer_session_factory, flush_interval=0.01)
+
+    def submit(first_id):
+        for comment_id in range(first_id, first_id + 25):
+            writer.submit(insert_comment(comment_id, 'Comment {}'.format(comment_id))).result()
+
+    threads = [threading.Thread(target=submit, args=(first_id,)) for first_id in range(0, 100, 25)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert count_comments(writer_session_factory) == 100
+    writer.close()
+
+
+def test_failing_write_does_not_fail_its_group(writer_session_factory):
+    writer = GroupCommitWriter(writer_session_factory, flush_interval=0.05)
+
+    good = writer.submit(insert_comment(1, 'First'))
+    duplicate = writer.submit(insert_comment(1, 'Duplicate id'))
+    other = writer.submit(insert_comment(2, 'Second'))
+
+    good.result()
+    other.result()
+    with pytest.raises(IntegrityError):
+        duplicate.result()
+    assert count_comments(writer_session_factory) == 2
+    writer.close()
+
+
+def test_close_commits_queued_writes(writer_session_factory):
+    writer = GroupCommitWriter(writer_session_factory, flush_interval=1)
+    futures = [writer.submit(insert_comment(comment_id, 'Queued')) for comment_id in range(10)]
+
+    writer.close()
+
+    assert all(future.done() for future in futures)
+    assert count_comments(writer_session_factory) == 10
+    with pytest.raises(RuntimeError):
+        writer.submit(insert_comment(11, 'Too late'))
+
+
+def test_submits_racing_close_are_committed_or_rejected(writer_session_factory):
+    writer = GroupCommitWriter(writer_session_factory, flush_interval=0.01)
+    futures, rejected = [], []
+
+    def submit(first_id):
+        for comment_id in range(first_id, first_id + 50):
+            try:
+                futures.append(writer.submit(insert_comment(comment_id, 'Racing')))
+            except RuntimeError:
+                rejected.append(comment_id)
+
+    threads = [threading.Thread(target=submit, args=(first_id,)) for first_id in range(0, 200, 50)]
+    for thread in threads:
+        thread.start()
+    writer.close()
+    for thread in threads:
+        thread.join()
+
+    # Check that every accepted write was committed before the writer stopped.
+    assert all(future.done() for future in futures)
+    assert count_comments(writer_session_factory) == len(futures) == 200 - len(rejected)
+
+
+def test_repository_comments_are_written_behind(database_engine):
+    repo = SqlAlchemyRepository(sessionmaker(bind=database_engine))
+    # The writer has an engine of its own, as in the application.
+    writer = GroupCommitWriter(sessionmaker(bind=create_engine(database_engine.url)))
+    write_comments_behind(repo, writer)
+
+    user = repo.get_user('irem')
+    product = repo.get_product('B44832')
+    repo.add_comment(make_comment('Great fit for running', user, product))
+
+    # Check that the writer committed the comment, reading it back through a connection of another engine.
+    rows = list(create_engine(database_engine.url).execute(
+        'SELECT comment FROM comments WHERE product_id = :product_id', {'product_id': 'B44832'}))
+    assert rows == [('Great fit for running',)]
+    writer.close()
+
+
+def test_group_waits_no_longer_than_flush_interval(writer_session_factory):
+    writer = GroupCommitWriter(writer_session_factory, flush_interval=0.2)
+    first = writer.submit(insert_comment(0, 'First'))
+
+    # Mutations arriving steadily within the interval must not keep postponing the first one's commit.
+    for comment_id in range(1, 10):
+        time.sleep(0.05)
+        writer.submit(insert_comment(comment_id, 'Later'))
+    assert first.done()
+    writer.close()
@@ -0,0 +1,68 @@
+import pytest
+
+from adidas.adapters.bloom_filter import BloomFilter, get_product_filter
+from adidas.domain.model import Product
+from adidas.home import services as home_services
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(1000)
+    for key in range(1000):
+        bloom_filter.add('P{}'.format(key))
+
+    assert all('P{}'.format(key) in bloom_filter for key in range(1000))
+    assert len(bloom_filter) == 1000
+
+
+def test_bloom_filter_false_positive_rate_is_near_configured_rate():
+    bloom_filter = BloomFilter(1000, false_positive_rate=0.01)
+    for key in range(1000):
+        bloom_filter.add('P{}'.format(key))
+
+    false_positives = sum(1 for key in range(10000) if 'Q{}'.format(key) in bloom_filter)
+    assert false_positives < 300
+
+
+def test_product_filter_knows_populated_and_added_products(in_memory_repo):
+    product_filter = get_product_filter(in_memory_repo)
+    assert product_filter.might_contain('AH2430')
+
+    in_memory_repo.add_product(Product('EPIC SHOES', 'Very epic', 'www.google.com', 'www.google.com/image', '123', 12, 2))
+
+    assert product_filter.might_contain('123')
+
+
+def test_product_filter_grows_with_catalog(in_memory_repo):
+    product_filter = get_product_filter(in_memory_repo)
+    capacity = product_filter.capacity
+
+    for number in range(capacity):
+        in_memory_repo.add_product(Product('EPIC SHOES', 'Very epic', 'www.google.com', 'www.google.com/image',
+                                           'E{}'.format(number), 12, 2))
+
+    assert product_filter.might_contain('E{}'.format(capacity - 1))
+    assert product_filter.capacity > capacity
+
+
+def test_unknown_product_is_rejected_without_repository_lookup(in_memory_repo):
+    get_product_filter(in_memory_repo)
+    lookups = []
+    get_product = in_memory_repo.get_product
+    in_memory_repo.get_product = lambda product_id: lookups.append(product_id) or get_product(product_id)
+
+    with pytest.raises(home_services.NonExistentProductException):
+        home_services.get_product('B4', in_memory_repo)
+
+    assert lookups == []
+
+
+def test_unknown_product_is_rejected_without_reading_catalog_version(in_memory_repo):
+    product_filter = get_product_filter(in_memory_repo)
+    counts = []
+    get_number_of_products = in_memory_repo.get_number_of_products
+    in_memory_repo.get_number_of_products = lambda: counts.append(1) or get_number_of_products()
+
+    home_services.product_changed('AH2430', in_memory_repo)
+
+    assert not product_filter.might_contain('B4')
+    assert counts == []
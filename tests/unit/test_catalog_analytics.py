@@ -0,0 +1,51 @@
+from adidas.adapters.catalog_analytics import CatalogAnalytics
+from adidas.domain.model import Product, Brand, User, make_brand_association, make_comment
+
+
+def make_product(product_id, price, discount, brand):
+    product = Product('Shoe ' + product_id, None, None, None, product_id, price, discount)
+    make_brand_association(product, brand)
+    return product
+
+
+def make_analytics():
+    originals, neo = Brand('ORIGINALS'), Brand('CORE / NEO')
+    return CatalogAnalytics([make_product('A', 1000, 0, originals), make_product('B', 3000, 40, originals),
+                             make_product('C', 8000, 50, originals), make_product('D', 12000, 0, neo)])
+
+
+def test_brand_summaries_are_sorted_by_brand():
+    summaries = make_analytics().brand_summaries()
+
+    assert [summary['brand'] for summary in summaries] == ['CORE / NEO', 'ORIGINALS']
+    assert [summary['number_of_products'] for summary in summaries] == [1, 3]
+
+
+def test_price_and_discount_statistics():
+    originals = make_analytics().brand_summaries()[1]
+
+    assert originals['price'] == {'min': 1000, 'max': 8000, 'mean': 4000, 'quartiles': [2000, 3000, 5500]}
+    assert originals['discount']['mean'] == 30
+    assert originals['number_discounted'] == 2
+    assert originals['price_bands'] == {'0-1999': 1, '2000-3999': 1, '4000-5999': 0, '6000-9999': 1, '10000+': 0}
+    assert originals['discount_bands'] == {'0': 1, '1-20': 0, '21-40': 1, '41-60': 1, '61+': 0}
+
+
+def test_single_product_brand():
+    neo = make_analytics().brand_summaries()[0]
+
+    assert neo['price'] == {'min': 12000, 'max': 12000, 'mean': 12000, 'quartiles': [12000, 12000, 12000]}
+    assert neo['number_of_comments'] == 0
+    assert neo['comments_per_product'] == 0
+
+
+def test_added_comments_are_counted():
+    analytics = make_analytics()
+    user = User('Dave', '123456789')
+
+    analytics.add_comment(make_comment('Love them', user, Product('Shoe A', None, None, None, 'A', 1000, 0)))
+    # Products added since the build are left out.
+    analytics.add_comment(make_comment('Love them', user, Product('Shoe E', None, None, None, 'E', 1000, 0)))
+
+    originals = analytics.brand_summaries()[1]
+    assert originals['number_of_comments'] == 1
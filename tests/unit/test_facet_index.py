@@ -0,0 +1,42 @@
+from adidas.adapters.facet_index import FacetIndex
+from adidas.domain.model import Product, Brand, make_brand_association
+
+
+def make_products():
+    originals, neo = Brand('ORIGINALS'), Brand('CORE / NEO')
+    products = []
+    for product_id, price, discount, brand in [('A', 1499, 0, originals), ('B', 2999, 50, originals),
+                                              ('C', 3999, 40, neo), ('D', 7999, 50, neo)]:
+        product = Product('Shoe ' + product_id, None, None, None, product_id, price, discount)
+        make_brand_association(product, brand)
+        products.append(product)
+    return products
+
+
+def test_facets_combine_across_dimensions():
+    index = FacetIndex(make_products())
+
+    product_ids, number_of_matches, _ = index.search({'brand': ['ORIGINALS'], 'discount': ['41-60']})
+    assert product_ids == ['B']
+    assert number_of_matches == 1
+
+
+def test_values_within_a_facet_are_alternatives():
+    index = FacetIndex(make_products())
+
+    product_ids, _, _ = index.search({'price_band': ['0-1999', '6000-9999']})
+    assert product_ids == ['A', 'D']
+
+
+def test_counts_ignore_the_facets_own_selection():
+    index = FacetIndex(make_products())
+
+    _, _, counts = index.search({'brand': ['ORIGINALS']})
+    assert counts['brand'] == {'CORE / NEO': 2, 'ORIGINALS': 2}
+    assert counts['discount'] == {'0': 1, '21-40': 0, '41-60': 1}
+
+
+def test_search_pages_through_matches():
+    index = FacetIndex(make_products())
+
+    assert index.search({}, cursor=1, limit=2)[0] == ['B', 'C']
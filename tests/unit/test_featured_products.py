@@ -0,0 +1,50 @@
+import random
+
+from adidas.utilities.featured_products import FeaturedProductsPool
+
+
+def test_pool_returns_requested_quantity(in_memory_repo):
+    pool = FeaturedProductsPool(in_memory_repo, pool_size=5)
+
+    products = pool.get_selected_products(3)
+    assert len(products) == 3
+    assert len(set(product['id'] for product in products)) == 3
+
+
+def test_pool_rotates_between_slots(in_memory_repo):
+    now = [0.0]
+    pool = FeaturedProductsPool(in_memory_repo, pool_size=6, rotation_interval=10, clock=lambda: now[0])
+
+    first = [product['id'] for product in pool.get_selected_products(3)]
+    first_slot = pool.rotation_slot()
+    # Check that requests within a slot are served the same slice.
+    assert [product['id'] for product in pool.get_selected_products(3)] == first
+
+    now[0] = 10.0
+    second = [product['id'] for product in pool.get_selected_products(3)]
+
+    # Check that the next slot is served a different slice of the pool.
+    assert pool.rotation_slot() != first_slot
+    assert set(first).isdisjoint(second)
+
+
+def test_pool_hands_out_copies(in_memory_repo):
+    pool = FeaturedProductsPool(in_memory_repo, pool_size=1)
+
+    product = pool.get_selected_products(1)[0]
+    product['hyperlink'] = 'changed'
+
+    assert pool.get_selected_products(1)[0]['hyperlink'] != 'changed'
+
+
+def test_rotation_slot_identifies_pool_by_its_products(in_memory_repo):
+    # Pools drawn alike, as by two worker processes, share their slots; pools drawn differently do not.
+    random.seed(235)
+    first = FeaturedProductsPool(in_memory_repo, pool_size=5, clock=lambda: 0.0)
+    random.seed(235)
+    second = FeaturedProductsPool(in_memory_repo, pool_size=5, clock=lambda: 0.0)
+    random.seed(236)
+    third = FeaturedProductsPool(in_memory_repo, pool_size=5, clock=lambda: 0.0)
+
+    assert first.rotation_slot() == second.rotation_slot()
+    assert first.rotation_slot() != third.rotation_slot()
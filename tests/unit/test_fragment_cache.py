@@ -0,0 +1,57 @@
+import os
+
+from flask import Flask
+from jinja2 import FileSystemLoader
+
+import adidas.utilities.fragment_cache as fragment_cache
+from adidas.utilities.fragment_cache import FragmentCache
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(fragment_cache.__file__), os.pardir, 'templates')
+
+
+def make_product(name='NMD_R1 Shoes', in_collection=False):
+    return {'id': 'AH2430', 'name': name, 'price': 9999, 'hyperlink': '/AH2430', 'image_hyperlink': '/AH2430.jpg',
+            'number_of_comments': 2, 'brand': {'name': 'ORIGINALS'}, 'add_comment_url': '/comment',
+            'add_to_collection': '/added', 'remove_from_collection': '/removed', 'in_collection': in_collection}
+
+
+def test_fragment_cache_counts_hits_and_misses():
+    cache = FragmentCache()
+
+    assert cache.get_or_render(('AH2430', 1), lambda: 'card') == 'card'
+    assert cache.get_or_render(('AH2430', 1), lambda: 'other') == 'card'
+
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.hit_rate == 0.5
+
+
+def test_fragment_cache_evicts_least_recently_used():
+    cache = FragmentCache(max_entries=2)
+    cache.get_or_render('a', lambda: 'A')
+    cache.get_or_render('b', lambda: 'B')
+    cache.get_or_render('a', lambda: 'A')
+    cache.get_or_render('c', lambda: 'C')
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    # Check that 'b' was evicted, as 'a' had been used more recently.
+    assert cache.get_or_render('b', lambda: 'B again') == 'B again'
+
+
+def test_product_card_is_rendered_once_per_key():
+    app = Flask(__name__)
+    app.jinja_loader = FileSystemLoader(TEMPLATES_PATH)
+    fragment_cache.init_app(app)
+
+    with app.test_request_context():
+        card = fragment_cache.render_product_card(make_product(), ('AH2430', 1, False))
+        assert 'NMD_R1 Shoes' in card and 'Add to collection' in card
+
+        # The same key is served from the cache; another viewer gets a card of their own.
+        assert fragment_cache.render_product_card(make_product('Renamed'), ('AH2430', 1, False)) == card
+        card = fragment_cache.render_product_card(make_product(in_collection=True), ('AH2430', 1, True))
+        assert 'Remove from collection' in card
+
+    cache = fragment_cache.get_fragment_cache(app)
+    assert (cache.hits, cache.misses) == (1, 2)
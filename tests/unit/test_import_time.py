@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imported only when first used, so they must not be loaded by importing the blueprint.
+DEFERRED_MODULES = ['better_profanity', 'wtforms', 'flask_wtf', 'numpy', 'scipy']
+
+
+def profile_import(module):
+    # Imports module in a fresh interpreter with -X importtime. Returns the names of the loaded modules and the
+    # cumulative import time in microseconds of each top-level package.
+    code = 'import sys, {0}; print(",".join(sorted(sys.modules)))'.format(module)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    cumulative = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if not fields[1].strip().isdigit():
+            continue
+        # Nested imports are indented by two spaces per level after the single space that follows the bar.
+        name = fields[2]
+        if not name[1:].startswith(' '):
+            cumulative[name.strip()] = int(fields[1])
+    return set(result.stdout.strip().split(',')), cumulative
+
+
+def slowest(cumulative, count=10):
+    return ', '.join('{} {:.1f} ms'.format(name, microseconds / 1000)
+                     for name, microseconds in sorted(cumulative.items(), key=lambda item: -item[1])[:count])
+
+
+def test_home_blueprint_defers_heavy_imports():
+    modules, cumulative = profile_import('adidas.home.home')
+
+    for module in DEFERRED_MODULES:
+        assert module not in modules, 'importing adidas.home.home loaded {} (slowest: {})'.format(
+            module, slowest(cumulative))
+
+
+def test_search_form_is_created_on_first_use():
+    modules, _ = profile_import('adidas.home.home; adidas.home.home.search_form_class()')
+
+    assert 'wtforms' in modules
+
+
+def test_only_top_level_imports_are_counted():
+    _, cumulative = profile_import('json')
+
+    assert 'json' in cumulative
+    assert 'json.decoder' not in cumulative
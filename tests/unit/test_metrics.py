@@ -0,0 +1,94 @@
+import gc
+import threading
+from functools import lru_cache
+
+from flask import Flask
+
+from adidas.utilities.metrics import Counter, Histogram, MetricsRegistry, get_registry, init_app, time_repository
+
+
+def test_counter_sums_values_from_all_threads():
+    counter = Counter('requests_total', 'Requests.', ['endpoint'])
+
+    def work():
+        for _ in range(1000):
+            counter.inc('home_bp.home')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.values() == {('home_bp.home',): 4000}
+
+
+def test_shards_of_finished_threads_are_retired():
+    counter = Counter('requests_total', 'Requests.', ['endpoint'])
+    histogram = Histogram('latency_seconds', 'Latency.', ['endpoint'], buckets=(0.1, 1.0))
+
+    def work():
+        counter.inc('home_bp.home')
+        histogram.observe(0.5, 'home')
+
+    for _ in range(10):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    # Check that the finished threads' shards are gone but their values are kept.
+    assert counter._shards == [] and histogram._shards == []
+    assert counter.values() == {('home_bp.home',): 10}
+    assert dict(histogram.samples())['latency_seconds_count{endpoint="home"}'] == 10
+
+
+def test_histogram_exposes_cumulative_buckets():
+    histogram = Histogram('latency_seconds', 'Latency.', ['endpoint'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'home')
+    histogram.observe(0.5, 'home')
+    histogram.observe(5, 'home')
+
+    samples = dict(histogram.samples())
+    assert samples['latency_seconds_bucket{endpoint="home",le="0.1"}'] == 1
+    assert samples['latency_seconds_bucket{endpoint="home",le="1.0"}'] == 2
+    assert samples['latency_seconds_bucket{endpoint="home",le="+Inf"}'] == 3
+    assert samples['latency_seconds_count{endpoint="home"}'] == 3
+    assert samples['latency_seconds_sum{endpoint="home"}'] == 5.55
+
+
+def test_registry_exposition_format():
+    registry = MetricsRegistry()
+    registry.requests.inc('home_bp.home', 200)
+
+    exposition = registry.exposition()
+    assert '# TYPE adidas_requests_total counter' in exposition
+    assert 'adidas_requests_total{endpoint="home_bp.home",status="200"} 1' in exposition
+
+
+def test_repository_calls_are_timed(in_memory_repo):
+    registry = MetricsRegistry()
+    time_repository(in_memory_repo, registry.repository_latency)
+
+    in_memory_repo.get_product('AH2430')
+
+    samples = dict(registry.repository_latency.samples())
+    assert samples['adidas_repository_duration_seconds_count{method="get_product"}'] == 1
+
+
+def test_cache_gauges_are_exposed():
+    app = Flask(__name__)
+
+    @lru_cache(maxsize=8)
+    def product_url(product_id):
+        return '/products/' + product_id
+
+    init_app(app, lru_caches=[('product_urls_cache', 'product URL cache', product_url)])
+    product_url('AH2430')
+    product_url('AH2430')
+
+    with app.test_request_context('/metrics'):
+        exposition = get_registry(app).exposition()
+    assert 'adidas_product_urls_cache_hit_ratio 0.5' in exposition
+    assert 'adidas_product_urls_cache_entries 1' in exposition
+    assert 'adidas_single_flight_in_flight 0' in exposition
@@ -0,0 +1,105 @@
+from threading import Event, Thread
+
+from flask import Flask
+
+from adidas.adapters import indexes
+from adidas.utilities.navigation import NavigationCache
+from adidas.domain.model import Product
+
+
+def test_catalog_version_changes_when_product_added(in_memory_repo):
+    version = indexes.catalog_version(in_memory_repo)
+
+    in_memory_repo.add_product(Product('EPIC SHOES', 'Very epic', 'www.google.com', 'www.google.com/image', '123', 12, 2))
+
+    assert indexes.catalog_version(in_memory_repo) != version
+
+
+def test_catalog_version_changes_when_bumped(in_memory_repo):
+    version = indexes.catalog_version(in_memory_repo)
+
+    indexes.bump_catalog_version(in_memory_repo)
+
+    assert indexes.catalog_version(in_memory_repo) != version
+
+
+def test_index_is_built_once_per_repository(in_memory_repo):
+    builds = []
+
+    def build(repo):
+        builds.append(repo)
+        return object()
+
+    first = indexes.get_index(in_memory_repo, 'test', build)
+    second = indexes.get_index(in_memory_repo, 'test', build)
+
+    assert first is second
+    assert builds == [in_memory_repo]
+
+
+def test_slow_build_does_not_hold_up_other_indexes(in_memory_repo):
+    building, release = Event(), Event()
+
+    def slow_build(repo):
+        building.set()
+        release.wait(timeout=5)
+        return 'slow'
+
+    thread = Thread(target=indexes.get_index, args=(in_memory_repo, 'slow', slow_build))
+    thread.start()
+    assert building.wait(timeout=5)
+
+    # Built while the slow index is still building.
+    assert indexes.get_index(in_memory_repo, 'fast', lambda repo: 'fast') == 'fast'
+
+    release.set()
+    thread.join(timeout=5)
+    assert indexes.get_index(in_memory_repo, 'slow', slow_build) == 'slow'
+
+
+def test_background_build_returns_none_until_built(in_memory_repo):
+    building, release, builds = Event(), Event(), []
+
+    def slow_build(repo):
+        builds.append(repo)
+        building.set()
+        release.wait(timeout=5)
+        return 'slow'
+
+    assert indexes.get_index_in_background(in_memory_repo, 'slow', slow_build) is None
+    assert building.wait(timeout=5)
+    assert indexes.get_index_in_background(in_memory_repo, 'slow', slow_build) is None
+
+    release.set()
+    assert indexes.get_index(in_memory_repo, 'slow', slow_build) == 'slow'
+    assert indexes.get_index_in_background(in_memory_repo, 'slow', slow_build) == 'slow'
+    assert builds == [in_memory_repo]
+
+
+def test_navigation_is_built_once_per_catalog_version(in_memory_repo):
+    cache = NavigationCache()
+    builds = []
+
+    def build(repo):
+        builds.append(repo.get_number_of_products())
+        return {'name_urls': dict(), 'brand_urls': dict()}
+
+    with Flask(__name__).test_request_context('/'):
+        first = cache.get(in_memory_repo, build)
+        assert cache.get(in_memory_repo, build) is first
+
+        in_memory_repo.add_product(Product('EPIC SHOES', 'Very epic', 'www.google.com', 'www.google.com/image', '123',
+                                           12, 2))
+        assert cache.get(in_memory_repo, build) is not first
+
+    assert len(builds) == 2
+    assert (cache.hits, cache.builds) == (1, 2)
+
+
+def test_navigation_is_built_per_application_root(in_memory_repo):
+    cache = NavigationCache()
+    app = Flask(__name__)
+    with app.test_request_context('/', base_url='http://localhost/shop'):
+        shop = cache.get(in_memory_repo, lambda repo: object())
+    with app.test_request_context('/'):
+        assert cache.get(in_memory_repo, lambda repo: object()) is not shop
@@ -0,0 +1,38 @@
+from adidas.adapters.prefix_index import PrefixIndex
+
+
+ENTRIES = [
+    ("Women's adidas Originals NMD_Racer Primeknit Shoes", 'product', 5),
+    ("Men's Originals Summer Adilette Slippers", 'product', 2),
+    ('ORIGINALS', 'brand', 908),
+    ("Women's adidas ORIGINALS SUPERSTAR BOUNCE PK  Low Shoes", 'product', 1),
+]
+
+
+def test_suggests_most_popular_first():
+    index = PrefixIndex(ENTRIES)
+
+    suggestions = index.suggest('orig')
+    assert [text for text, _, _ in suggestions][:2] == ['ORIGINALS', "Women's adidas Originals NMD_Racer Primeknit Shoes"]
+    assert len(suggestions) == 4
+
+
+def test_matches_from_any_word():
+    index = PrefixIndex(ENTRIES)
+
+    assert index.suggest('SUPERsta') == [("Women's adidas ORIGINALS SUPERSTAR BOUNCE PK  Low Shoes", 'product', 1)]
+
+
+def test_long_prefixes_use_sorted_keys():
+    index = PrefixIndex(ENTRIES, max_prefix_length=4)
+
+    assert [text for text, _, _ in index.suggest('summer adil')] == ["Men's Originals Summer Adilette Slippers"]
+    assert index.suggest('summer boots') == []
+
+
+def test_limit_and_empty_prefix():
+    index = PrefixIndex(ENTRIES, k=3)
+
+    assert len(index.suggest('o', limit=2)) == 2
+    assert len(index.suggest('o', limit=10)) == 3
+    assert index.suggest('   ') == []
@@ -0,0 +1,61 @@
+import threading
+
+from adidas.utilities.profiler import StackSampler
+
+
+def busy_endpoint(running):
+    while running[0]:
+        pass
+
+
+def test_sampler_collects_folded_stacks_for_profiled_thread(tmp_path):
+    sampler = StackSampler(str(tmp_path))
+    running = [True]
+    thread = threading.Thread(target=busy_endpoint, args=(running,))
+    thread.start()
+
+    sampler._active[thread.ident] = 'home_bp.home'
+    for _ in range(5):
+        sampler.sample()
+    running[0] = False
+    thread.join()
+
+    stacks = sampler.stacks('home_bp.home')
+    assert sum(stacks.values()) == 5
+    assert all(stack.endswith('test_profiler.py:busy_endpoint') for stack in stacks)
+
+
+def test_sampler_dumps_stacks_per_endpoint(tmp_path):
+    sampler = StackSampler(str(tmp_path))
+    sampler._stacks['home_bp.home'] = {'a;b': 3}
+
+    path = sampler.dump('home_bp.home')
+
+    with open(path) as file:
+        assert file.read() == 'a;b 3\n'
+
+
+def test_concurrent_dumps_do_not_collide(tmp_path):
+    sampler = StackSampler(str(tmp_path))
+    sampler._stacks['home_bp.home'] = {'a;b': 3}
+
+    threads = [threading.Thread(target=sampler.dump, args=('home_bp.home',)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['home_bp.home.folded']
+
+
+def test_sampler_thread_dumps_and_stops_when_nothing_is_profiled(tmp_path):
+    sampler = StackSampler(str(tmp_path), interval=0.001)
+
+    sampler.start_profiling(threading.get_ident(), 'home_bp.home')
+    thread = sampler._thread
+    sampler.stop_profiling(threading.get_ident())
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert sampler._thread is None
+    assert (tmp_path / 'home_bp.home.folded').exists()
@@ -0,0 +1,53 @@
+from adidas.adapters.rankings import Ranking
+from adidas.domain.model import Product, Brand, make_brand_association
+
+
+def make_product(product_id, discount, brand):
+    product = Product('Shoe ' + product_id, None, None, None, product_id, 1000, discount)
+    make_brand_association(product, brand)
+    return product
+
+
+def discount(product):
+    return product.discount
+
+
+def test_ranking_orders_by_score_overall_and_per_brand():
+    originals, neo = Brand('ORIGINALS'), Brand('CORE / NEO')
+    ranking = Ranking(discount)
+    for product in [make_product('A', 20, originals), make_product('B', 60, neo), make_product('C', 40, originals)]:
+        ranking.update(product)
+
+    assert ranking.top(2) == ['B', 'C']
+    assert ranking.top(10, 'ORIGINALS') == ['C', 'A']
+    assert ranking.top(10, 'SPORT PERFORMANCE') == []
+
+
+def test_ranking_moves_rescored_product():
+    originals = Brand('ORIGINALS')
+    ranking = Ranking(discount)
+    product = make_product('A', 20, originals)
+    ranking.update(product)
+    ranking.update(make_product('B', 40, originals))
+
+    product.discount = 70
+    ranking.update(product)
+
+    assert ranking.top(10) == ['A', 'B']
+    assert ranking.top(10, 'ORIGINALS') == ['A', 'B']
+
+
+def test_ranking_refills_top_when_member_drops():
+    originals = Brand('ORIGINALS')
+    ranking = Ranking(discount, capacity=2)
+    products = [make_product(product_id, score, originals) for product_id, score in [('A', 20), ('B', 60), ('C', 40)]]
+    for product in products:
+        ranking.update(product)
+    assert ranking.top(2) == ['B', 'C']
+
+    products[1].discount = 10
+    ranking.update(products[1])
+
+    assert ranking.top(2) == ['C', 'A']
+    assert ranking.top(2, 'ORIGINALS') == ['C', 'A']
+    assert ranking.top(10) == ['C', 'A', 'B']
@@ -0,0 +1,72 @@
+import threading
+
+from flask import Flask
+
+from adidas.utilities import metrics, readiness
+from adidas.utilities.readiness import populate_in_background, requires_ready
+
+
+def make_app():
+    app = Flask(__name__)
+    readiness.init_app(app)
+
+    @app.route('/products')
+    @requires_ready('catalog')
+    def products():
+        return 'products'
+
+    return app
+
+
+def test_routes_return_503_until_stage_is_ready():
+    app = make_app()
+    release = threading.Event()
+    state = populate_in_background(app, [('hot', lambda: None), ('catalog', release.wait)])
+    client = app.test_client()
+
+    response = client.get('/products')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    assert client.get('/readyz').status_code == 503
+    assert client.get('/healthz').status_code == 200
+
+    release.set()
+    assert state.wait(timeout=5)
+
+    assert client.get('/products').status_code == 200
+    assert client.get('/readyz').get_json()['stages'] == {'hot': True, 'catalog': True}
+
+
+def test_population_time_is_recorded():
+    app = make_app()
+    metrics.init_app(app)
+
+    state = populate_in_background(app, [('hot', lambda: None)])
+
+    assert state.wait(timeout=5)
+    assert metrics.get_registry(app).populate_seconds is not None
+
+
+def test_failed_stage_is_reported():
+    app = make_app()
+
+    def fail():
+        raise RuntimeError('no catalog')
+
+    state = populate_in_background(app, [('hot', lambda: None), ('catalog', fail)])
+    client = app.test_client()
+
+    assert not state.wait(timeout=5)
+    assert state.is_ready('hot')
+    # Check that routes and the liveness check stop waiting for a stage that will never complete.
+    assert client.get('/products').status_code == 500
+    response = client.get('/healthz')
+    assert response.status_code == 500
+    assert response.get_json()['failed'] == 'catalog: no catalog'
+
+
+def test_app_without_background_population_is_ready():
+    client = make_app().test_client()
+
+    assert client.get('/products').status_code == 200
+    assert client.get('/readyz').status_code == 200
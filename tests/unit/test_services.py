@@ -6,6 +6,7 @@ from adidas.authentication.services import AuthenticationException
 from adidas.products import services as products_services
 from adidas.authentication import services as auth_services
 from adidas.products.services import NonExistentProductException
+from adidas.home import services as home_services
 
 
 def test_can_add_user(in_memory_repo):
@@ -91,14 +92,15 @@ def test_cannot_add_comment_by_unknown_user(in_memory_repo):
 def test_can_get_product(in_memory_repo):
     product_id = 'AH2430'
 
-    product_as_dict = products_services.get_product(product_id, in_memory_repo)
+    product_as_dict = home_services.get_product(product_id, in_memory_repo)
 
     assert product_as_dict['id'] == product_id
     assert product_as_dict['name'] == 'Women\'s adidas Originals NMD_Racer Primeknit Shoes'
     assert product_as_dict['description'] == "Channeling the streamlined look of an '80s racer, these shoes are updated with modern features. The foot-hugging adidas Primeknit upper offers a soft, breathable feel. The Boost midsole provides responsive comfort accented with a contrast-color EVA heel plug. Embroidered details add a distinctive finish."
     assert product_as_dict['hyperlink'] == 'https://shop.adidas.co.in/#!product/AH2430_nmd_racerpkw'
     assert product_as_dict['image_hyperlink'] == 'https://content.adidas.co.in/static/Product-AH2430/WOMEN_Originals_SHOES_LOW_AH2430_1.jpg'
-    assert len(product_as_dict['comments']) == 3
+    assert product_as_dict['number_of_comments'] == 3
+    assert 'comments' not in product_as_dict
     brand_name = product_as_dict['brand']['name']
     assert 'ORIGINALS' == brand_name
 
@@ -178,3 +180,195 @@ def test_get_comments_for_product_without_comments(in_memory_repo):
     comments_as_dict = products_services.get_comments_for_product("B44832", in_memory_repo)
     assert len(comments_as_dict) == 0
 
+
+def test_get_comments_for_product_by_page(in_memory_repo):
+    first_page = home_services.get_comments_for_product("AH2430", in_memory_repo, cursor=0, limit=2)
+    second_page = home_services.get_comments_for_product("AH2430", in_memory_repo, cursor=2, limit=2)
+
+    # Check that the comments are split across the pages in timestamp order.
+    assert [comment['comment_text'] for comment in first_page] == ['I really want this. Damn', 'Best product!']
+    assert [comment['comment_text'] for comment in second_page] == ['Wow my favorite colour!']
+
+
+def test_get_comments_for_product_beyond_last_page(in_memory_repo):
+    comments_as_dict = home_services.get_comments_for_product("AH2430", in_memory_repo, cursor=3, limit=2)
+    assert len(comments_as_dict) == 0
+
+
+def test_get_recent_comments(in_memory_repo):
+    comments_as_dict = home_services.get_recent_comments(in_memory_repo)
+
+    # Check that the comments are returned newest first.
+    assert [comment['comment_text'] for comment in comments_as_dict] == \
+           ['Wow my favorite colour!', 'Best product!', 'I really want this. Damn']
+
+
+def test_get_recent_comments_includes_new_comment(in_memory_repo):
+    home_services.get_recent_comments(in_memory_repo)
+    home_services.add_comment('AH2430', 'Just bought a pair!', 'tobin', in_memory_repo)
+
+    comments_as_dict = home_services.get_recent_comments(in_memory_repo, limit=1)
+    assert comments_as_dict[0]['comment_text'] == 'Just bought a pair!'
+
+
+def test_get_recent_comments_includes_comment_added_through_products_services(in_memory_repo):
+    home_services.get_recent_comments(in_memory_repo)
+    products_services.add_comment('AH2430', 'Just bought a pair!', 'tobin', in_memory_repo)
+
+    comments_as_dict = home_services.get_recent_comments(in_memory_repo, limit=1)
+    assert comments_as_dict[0]['comment_text'] == 'Just bought a pair!'
+
+
+def test_get_recent_comments_keeps_comments_added_while_feed_is_built(in_memory_repo):
+    get_comments = in_memory_repo.get_comments
+
+    def get_comments_while_commenting():
+        # Other requests store one comment before the feed reads the comments and one after.
+        home_services.add_comment('AH2430', 'Read with the others', 'tobin', in_memory_repo)
+        comments = list(get_comments())
+        home_services.add_comment('AH2430', 'Stored after the read', 'tobin', in_memory_repo)
+        return comments
+
+    in_memory_repo.get_comments = get_comments_while_commenting
+    comments_as_dict = home_services.get_recent_comments(in_memory_repo, limit=10)
+
+    # Check that each comment is in the feed exactly once.
+    assert [comment['comment_text'] for comment in comments_as_dict][:2] == \
+           ['Stored after the read', 'Read with the others']
+    assert len(comments_as_dict) == 5
+
+
+def test_get_recent_comments_for_brand(in_memory_repo):
+    comments_as_dict = home_services.get_recent_comments(in_memory_repo, cursor=1, limit=5, brand_name='ORIGINALS')
+    assert len(comments_as_dict) == 2
+
+    comments_as_dict = home_services.get_recent_comments(in_memory_repo, brand_name='CORE / NEO')
+    assert len(comments_as_dict) == 0
+
+
+def test_can_add_comments_in_bulk(in_memory_repo):
+    failures = home_services.add_comments([
+        ('AH2430', 'Comfortable all day', 'tobin'),
+        ('B44832', 'Runs a little small', 'irem'),
+        ('B44832', 'Great colour', 'archie'),
+    ], in_memory_repo, chunk_size=2)
+
+    assert failures == []
+    assert len(home_services.get_comments_for_product('B44832', in_memory_repo)) == 2
+    assert len(home_services.get_comments_for_product('AH2430', in_memory_repo)) == 4
+
+
+def test_add_comments_stores_each_chunk_at_once(in_memory_repo):
+    add_comment = in_memory_repo.add_comment
+    chunks = []
+
+    def add_comments(comments):
+        chunks.append(len(comments))
+        for comment in comments:
+            add_comment(comment)
+
+    in_memory_repo.add_comments = add_comments
+    home_services.get_recent_comments(in_memory_repo)
+
+    failures = home_services.add_comments([
+        ('AH2430', 'Comfortable all day', 'tobin'),
+        ('B44832', 'Runs a little small', 'irem'),
+        ('B44832', 'Great colour', 'archie'),
+    ], in_memory_repo, chunk_size=2)
+
+    assert failures == []
+    assert chunks == [2, 1]
+    # Check that comments stored in chunks still reach the comment feed.
+    assert home_services.get_recent_comments(in_memory_repo, limit=1)[0]['comment_text'] == 'Great colour'
+
+
+def test_add_comments_reports_failures_per_comment(in_memory_repo):
+    failures = home_services.add_comments([
+        ('AH2430', 'Comfortable all day', 'tobin'),
+        ('AH24', 'No such product', 'tobin'),
+        ('AH2430', 'No such user', 'jin'),
+        ('AH2430', '   ', 'tobin'),
+    ], in_memory_repo)
+
+    assert [(position, type(exception)) for position, exception in failures] == [
+        (1, home_services.NonExistentProductException),
+        (2, home_services.UnknownUserException),
+        (3, home_services.InvalidCommentException),
+    ]
+    assert len(home_services.get_comments_for_product('AH2430', in_memory_repo)) == 4
+
+
+def test_get_suggestions(in_memory_repo):
+    suggestions = home_services.get_suggestions('origin', in_memory_repo)
+
+    # Check that the brand is the most popular suggestion.
+    assert suggestions[0] == {'text': 'ORIGINALS', 'kind': 'brand'}
+    assert len(suggestions) == 10
+
+
+def test_sort_product_ids_by_price(in_memory_repo):
+    product_ids = ['AH2430', 'G27341', 'CM6008', '280648']
+
+    sorted_ids = home_services.sort_product_ids(product_ids, 'price', in_memory_repo)
+
+    prices = [product['price'] for product in products_services.get_products_by_id(sorted_ids, in_memory_repo)]
+    assert prices == sorted(prices)
+    assert sorted_ids[0] == '280648'
+
+
+def test_sort_product_ids_with_unknown_key(in_memory_repo):
+    with pytest.raises(ValueError):
+        home_services.sort_product_ids(['AH2430'], 'colour', in_memory_repo)
+
+
+def test_get_best_deals(in_memory_repo):
+    products_as_dict = home_services.get_best_deals(in_memory_repo, limit=5, brand_name='ORIGINALS')
+
+    assert len(products_as_dict) == 5
+    assert all(product['brand']['name'] == 'ORIGINALS' for product in products_as_dict)
+
+
+def test_best_deals_follow_price_updates(in_memory_repo):
+    best_deal = home_services.get_best_deals(in_memory_repo, limit=1)[0]
+    assert best_deal['id'] != 'B44832'
+
+    home_services.update_product_price('B44832', 1000, 99, in_memory_repo)
+
+    assert home_services.get_best_deals(in_memory_repo, limit=1)[0]['id'] == 'B44832'
+    assert home_services.get_product('B44832', in_memory_repo)['price'] == 1000
+
+
+def test_update_price_of_non_existent_product(in_memory_repo):
+    with pytest.raises(home_services.NonExistentProductException):
+        home_services.update_product_price('UNKNOWN', 1000, 10, in_memory_repo)
+
+
+def test_most_reviewed_follows_new_comments(in_memory_repo):
+    assert home_services.get_most_reviewed(in_memory_repo, limit=1)[0]['id'] == 'AH2430'
+
+    for text in ('Love them', 'Perfect fit', 'Great colour', 'So comfy'):
+        home_services.add_comment('B44832', text, 'tobin', in_memory_repo)
+
+    assert home_services.get_most_reviewed(in_memory_repo, limit=1)[0]['id'] == 'B44832'
+
+
+def test_get_similar_products(in_memory_repo):
+    products_as_dict = home_services.get_similar_products('AH2430', in_memory_repo, limit=3)
+
+    assert 0 < len(products_as_dict) <= 3
+    assert 'AH2430' not in [product['id'] for product in products_as_dict]
+
+
+def test_get_similar_products_for_unknown_product(in_memory_repo):
+    with pytest.raises(home_services.NonExistentProductException):
+        home_services.get_similar_products('UNKNOWN', in_memory_repo)
+
+
+def test_brand_analytics_follow_new_comments(in_memory_repo):
+    summaries = {summary['brand']: summary for summary in home_services.get_brand_analytics(in_memory_repo)}
+    number_of_comments = summaries['ORIGINALS']['number_of_comments']
+
+    home_services.add_comment('AH2430', 'Love them', 'tobin', in_memory_repo)
+
+    summaries = {summary['brand']: summary for summary in home_services.get_brand_analytics(in_memory_repo)}
+    assert summaries['ORIGINALS']['number_of_comments'] == number_of_comments + 1
@@ -0,0 +1,110 @@
+import pytest
+
+from adidas.adapters.memory_repository import MemoryRepository
+from adidas.adapters.repository import RepositoryException
+from adidas.adapters.sharded_repository import ShardedRepository, copy_catalog, rebalance, shard_index
+from adidas.domain.model import Product, make_comment
+
+
+@pytest.fixture
+def sharded_repo(in_memory_repo):
+    repo = ShardedRepository([MemoryRepository() for _ in range(3)])
+    copy_catalog(in_memory_repo, repo, usernames=['tobin', 'irem', 'archie'])
+    yield repo
+    repo.close()
+
+
+def test_products_are_partitioned_by_id(sharded_repo):
+    counts = [shard.get_number_of_products() for shard in sharded_repo.shards]
+
+    assert sum(counts) == 2625
+    assert all(count > 0 for count in counts)
+    assert sharded_repo.shard_for('AH2430').get_product('AH2430') is sharded_repo.get_product('AH2430')
+
+
+def test_shard_index_is_stable():
+    assert shard_index('AH2430', 3) == shard_index('AH2430', 3)
+    assert 0 <= shard_index('AH2430', 7) < 7
+
+
+def test_users_and_brands_are_replicated(sharded_repo):
+    for shard in sharded_repo.shards:
+        assert shard.get_user('tobin') is not None
+        assert len(shard.get_brands()) == 3
+
+
+def test_cross_shard_reads_match_single_repository(sharded_repo, in_memory_repo):
+    assert sharded_repo.get_number_of_products() == in_memory_repo.get_number_of_products()
+    assert sorted(sharded_repo.get_product_ids_for_brand('ORIGINALS')) == \
+           sorted(in_memory_repo.get_product_ids_for_brand('ORIGINALS'))
+    assert len(sharded_repo.get_products_by_price(2999)) == 2
+    assert len(sharded_repo.get_comments()) == 3
+
+    product = sharded_repo.get_product('CM6008')
+    assert sharded_repo.get_price_of_previous_product(product) == 3599
+    assert sharded_repo.get_price_of_next_product(sharded_repo.get_product('280648')) == 4999
+
+
+def test_products_by_id_keep_requested_order(sharded_repo):
+    products = sharded_repo.get_products_by_id(['EF9924', 'B4', 'CM6008'])
+
+    assert [product.id for product in products] == ['EF9924', 'CM6008']
+
+
+def test_brands_cover_every_shard(sharded_repo, in_memory_repo):
+    brands = sharded_repo.get_brands()
+
+    assert sorted(brand.brand_name for brand in brands) == \
+           sorted(brand.brand_name for brand in in_memory_repo.get_brands())
+    assert sum(len(list(brand.branded_products)) for brand in brands) == 2625
+
+
+def test_comments_stay_with_their_product(sharded_repo):
+    product = sharded_repo.get_product('AH2430')
+
+    assert product.number_of_comments == 3
+    assert len(sharded_repo.shard_for('AH2430').get_comments()) == 3
+
+
+def test_comment_is_stored_with_its_product_shards_user(sharded_repo):
+    user = sharded_repo.get_user_for_product('tobin', 'AH2430')
+    product = sharded_repo.get_product('AH2430')
+    comment = make_comment('Just bought a pair!', user, product)
+
+    sharded_repo.add_comment(comment)
+
+    assert user is sharded_repo.shard_for('AH2430').get_user('tobin')
+    assert comment in sharded_repo.shard_for('AH2430').get_comments()
+    assert comment in product.comments
+
+
+def test_comment_made_with_another_shards_user_is_rejected(sharded_repo):
+    product_id = next(product.id for brand in sharded_repo.shards[1].get_brands() for product in brand.branded_products)
+    comment = make_comment('Just bought a pair!', sharded_repo.shards[0].get_user('tobin'),
+                           sharded_repo.get_product(product_id))
+
+    with pytest.raises(RepositoryException):
+        sharded_repo.add_comment(comment)
+
+
+def test_closed_repository_stops_fanning_out(sharded_repo):
+    sharded_repo.close()
+
+    with pytest.raises(RuntimeError):
+        sharded_repo.get_number_of_products()
+
+
+def test_add_product_updates_price_index(sharded_repo):
+    product = Product('EPIC SHOES', 'Very epic', 'www.google.com', 'www.google.com/image', '123', 3000, 2)
+    sharded_repo.add_product(product)
+
+    assert sharded_repo.get_product('123') is product
+    assert sharded_repo.get_price_of_next_product(sharded_repo.get_product('280648')) == 3000
+
+
+def test_rebalance_to_more_shards(sharded_repo):
+    rebalanced = rebalance(sharded_repo, [MemoryRepository() for _ in range(5)], usernames=['tobin'])
+
+    assert len(rebalanced.shards) == 5
+    assert rebalanced.get_number_of_products() == 2625
+    assert rebalanced.get_product('AH2430').number_of_comments == 3
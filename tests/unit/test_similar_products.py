@@ -0,0 +1,90 @@
+from adidas.adapters.similar_products import SimilarProducts, tokenize
+from adidas.domain.model import Product, Brand, make_brand_association
+
+
+def make_product(product_id, name, description, price, brand):
+    product = Product(name, description, None, None, product_id, price, 0)
+    make_brand_association(product, brand)
+    return product
+
+
+def make_products():
+    originals, neo = Brand('ORIGINALS'), Brand('CORE / NEO')
+    return [make_product('A', 'Superstar Shoes', 'White leather upper', 6999, originals),
+            make_product('B', 'Superstar Slip-on Shoes', 'Leather upper', 7599, originals),
+            make_product('C', 'Running Tee', 'Soft cotton', 999, neo),
+            make_product('D', 'Running Shorts', 'Cotton shorts', 1299, neo)], originals, neo
+
+
+def test_tokenize():
+    assert tokenize("Men's SUPERSTAR Slip-on") == ['men', 's', 'superstar', 'slip', 'on']
+    assert tokenize(None) == []
+
+
+def test_precomputes_neighbours():
+    products, _, _ = make_products()
+    similar_products = SimilarProducts(products, k=2)
+
+    assert similar_products.similar('A') == ['B']
+    assert similar_products.similar('C') == ['D']
+    assert similar_products.similar('UNKNOWN') == []
+
+
+def test_added_product_joins_neighbour_lists():
+    products, _, neo = make_products()
+    similar_products = SimilarProducts(products, k=2)
+
+    similar_products.add_product(make_product('E', 'Running Cotton Tee', 'Soft cotton', 1099, neo))
+
+    assert similar_products.similar('E') == ['C', 'D']
+    assert similar_products.similar('C')[0] == 'E'
+
+
+def test_updated_product_moves_between_neighbour_lists():
+    products, _, neo = make_products()
+    similar_products = SimilarProducts(products, k=2)
+
+    product = products[0]
+    product.name, product.description, product.price = 'Running Tee', 'Soft cotton', 999
+    make_brand_association(product, neo)
+    similar_products.update_product(product)
+
+    assert 'A' not in similar_products.similar('B')
+    assert similar_products.similar('C')[0] == 'A'
+
+
+def test_recommends_for_several_products():
+    products, _, _ = make_products()
+    similar_products = SimilarProducts(products, k=3)
+
+    assert similar_products.recommend(['C', 'D'], limit=1) == []
+    assert similar_products.recommend(['A'], limit=1) == ['B']
+
+
+def test_products_added_together_are_neighbours():
+    products, _, neo = make_products()
+    similar_products = SimilarProducts(products, k=2)
+
+    similar_products.add_product(make_product('E', 'Hiking Boots', 'Waterproof suede', 12999, neo))
+    similar_products.add_product(make_product('F', 'Hiking Boots', 'Waterproof suede', 12999, neo))
+
+    assert similar_products.similar('E')[0] == 'F'
+    assert similar_products.similar('F')[0] == 'E'
+
+
+def test_price_changes_do_not_grow_the_matrix():
+    products, _, _ = make_products()
+    similar_products = SimilarProducts(products, k=2)
+
+    product = products[0]
+    product.price = 7999
+    similar_products.update_product(product)
+    assert similar_products.similar('A') == ['B']
+    assert similar_products._matrix.shape[0] == 4
+
+    for price in [999, 6999] * 10:
+        product.price = price
+        similar_products.update_product(product)
+        assert similar_products.similar('A')[0] == 'B'
+    assert similar_products._matrix.shape[0] <= 5
+    assert similar_products.similar('B') == ['A']
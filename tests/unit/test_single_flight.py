@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from adidas.utilities.single_flight import SingleFlight, SingleFlightTimeout
+
+
+def run_concurrently(single_flight, key, function, callers, timeout=5.0):
+    results = [None] * callers
+    errors = [None] * callers
+    barrier = threading.Barrier(callers)
+
+    def call(position):
+        barrier.wait()
+        try:
+            results[position] = single_flight.do(key, function, timeout)
+        except Exception as exception:
+            errors[position] = exception
+
+    threads = [threading.Thread(target=call, args=(position,)) for position in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def slow_search(calls):
+    def search():
+        calls.append(1)
+        time.sleep(0.2)
+        return ['AH2430', 'G27341']
+    return search
+
+
+def test_concurrent_callers_share_one_computation():
+    calls = []
+    results, errors = run_concurrently(SingleFlight(), 'Shoes', slow_search(calls), callers=8)
+
+    assert len(calls) == 1
+    assert results == [['AH2430', 'G27341']] * 8
+    assert errors == [None] * 8
+
+
+def test_errors_are_propagated_to_every_caller():
+    def failing():
+        time.sleep(0.1)
+        raise ValueError('repository unavailable')
+
+    results, errors = run_concurrently(SingleFlight(), 'Shoes', failing, callers=4)
+
+    assert all(isinstance(error, ValueError) for error in errors)
+
+
+def test_waiting_caller_times_out():
+    single_flight = SingleFlight()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        return 'done'
+
+    leader = threading.Thread(target=single_flight.do, args=('Shoes', slow))
+    leader.start()
+    started.wait()
+
+    with pytest.raises(SingleFlightTimeout):
+        single_flight.do('Shoes', slow, timeout=0.05)
+    leader.join()
+
+
+def test_results_are_not_cached_after_completion():
+    calls = []
+    single_flight = SingleFlight()
+
+    single_flight.do('Shoes', slow_search(calls))
+    single_flight.do('Shoes', slow_search(calls))
+
+    assert len(calls) == 2
+
+
+def test_calls_in_different_scopes_are_not_coalesced():
+    calls = []
+    single_flight = SingleFlight()
+    first, second = object(), object()
+    thread = threading.Thread(target=single_flight.do, args=('Shoes', slow_search(calls)), kwargs={'scope': first})
+    thread.start()
+    time.sleep(0.05)
+
+    single_flight.do('Shoes', slow_search(calls), scope=second)
+    thread.join()
+    assert len(calls) == 2
+
+
+def test_calls_are_coalesced_through_lock_directory(tmp_path):
+    calls = []
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    thread = threading.Thread(target=first.do, args=('Shoes', slow_search(calls)))
+    thread.start()
+    time.sleep(0.05)
+
+    # A second coalescer sharing the lock directory, as another worker process would, waits for the first.
+    assert second.do('Shoes', slow_search(calls)) == ['AH2430', 'G27341']
+    thread.join()
+    assert len(calls) == 1
+    # The last caller out removes the key's files.
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_results_left_in_lock_directory_before_waiting_are_not_reused(tmp_path):
+    calls = []
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+
+    first.do('Shoes', slow_search(calls))
+    second.do('Shoes', slow_search(calls))
+
+    assert len(calls) == 2
+
+
+def test_waiting_on_lock_directory_times_out(tmp_path):
+    calls = []
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    thread = threading.Thread(target=first.do, args=('Shoes', slow_search(calls)))
+    thread.start()
+    time.sleep(0.05)
+
+    with pytest.raises(SingleFlightTimeout):
+        second.do('Shoes', slow_search(calls), timeout=0.05)
+    thread.join()
+    assert len(calls) == 1
+    assert list(tmp_path.iterdir()) == []
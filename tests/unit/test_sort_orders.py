@@ -0,0 +1,30 @@
+from adidas.adapters.sort_orders import SortOrders
+from adidas.domain.model import Product
+
+
+def make_products():
+    return [Product('Shoe ' + product_id, None, None, None, product_id, price, discount)
+            for product_id, price, discount in [('A', 3999, 40), ('B', 1499, 0), ('C', 7999, 50), ('D', 2999, 50)]]
+
+
+def test_sorts_small_result_sets_by_rank():
+    orders = SortOrders(make_products())
+
+    assert orders.sort(['A', 'C'], 'price') == ['A', 'C']
+    assert orders.sort(['A', 'C'], 'price_desc') == ['C', 'A']
+
+
+def test_pages_large_result_sets_from_presorted_order():
+    orders = SortOrders(make_products())
+
+    assert orders.sort(['A', 'B', 'C', 'D'], 'price', cursor=0, limit=2) == ['B', 'D']
+    assert orders.sort(['A', 'B', 'C', 'D'], 'price', cursor=2, limit=2) == ['A', 'C']
+    # Equal discounts are ordered by product id.
+    assert orders.sort(['A', 'B', 'C', 'D'], 'discount', cursor=0, limit=3) == ['C', 'D', 'A']
+
+
+def test_unknown_ids_come_last():
+    orders = SortOrders(make_products())
+
+    assert orders.sort(['NEW', 'A', 'B', 'C'], 'price', cursor=0, limit=4) == ['B', 'A', 'C', 'NEW']
+    assert orders.sort(['NEW', 'A'], 'price') == ['A', 'NEW']
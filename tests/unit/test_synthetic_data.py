@@ -0,0 +1,42 @@
+import csv
+import os
+
+from adidas.adapters import synthetic_data
+
+
+def read_rows(path, file_name):
+    with open(os.path.join(path, file_name), newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def test_generates_requested_number_of_rows(tmp_path):
+    synthetic_data.generate(str(tmp_path), products=50, users=5, comments=20)
+
+    assert len(read_rows(tmp_path, 'adidas.csv')) == 50
+    assert len(read_rows(tmp_path, 'users.csv')) == 5
+    assert len(read_rows(tmp_path, 'comments.csv')) == 20
+
+
+def test_generation_is_deterministic_for_a_seed(tmp_path):
+    synthetic_data.generate(str(tmp_path / 'first'), products=20, users=2, comments=5, seed=7)
+    synthetic_data.generate(str(tmp_path / 'second'), products=20, users=2, comments=5, seed=7)
+
+    for file_name in ('adidas.csv', 'users.csv', 'comments.csv'):
+        assert (tmp_path / 'first' / file_name).read_bytes() == (tmp_path / 'second' / file_name).read_bytes()
+
+
+def test_generated_products_are_consistent(tmp_path):
+    synthetic_data.generate(str(tmp_path), products=200, users=3, comments=50)
+    products = read_rows(tmp_path, 'adidas.csv')
+    product_ids = set(product['Product ID'] for product in products)
+
+    # Check that prices follow from the discount and that brands come from the sample feed.
+    for product in products:
+        listing_price, discount = int(product['Listing Price']), int(product['Discount'])
+        assert int(product['Sale Price']) == listing_price * (100 - discount) // 100
+        assert product['Brand'] in ('ORIGINALS', 'CORE / NEO', 'SPORT PERFORMANCE')
+
+    # Check that comments refer to generated products and users.
+    for comment in read_rows(tmp_path, 'comments.csv'):
+        assert comment['product-id'] in product_ids
+        assert 1 <= int(comment['author-id']) <= 3